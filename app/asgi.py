@@ -1,116 +1,559 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-import os
-import pandas as pd
-import joblib
-import json
-from typing import List, Dict
+import time
+
+# Instante en que se empezó a importar el módulo: origen de los tiempos de arranque
+MODULE_STARTED_AT = time.perf_counter()
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
+import os
+import numpy as np
+import asyncio
+import threading
+from typing import List, Dict, Optional
+from batcher import batcher_from_env
+from log_sink import sink_from_env
+from fast_path import pack_features, build_response
+from prediction_cache import cache_from_env
+from telemetry import Telemetry, TelemetryMiddleware
+from profiler import ProfilerMiddleware, profiler_from_env
+from startup import tracker_from_env
+from stream_scoring import iter_lines, parse_record, dumps_line, ResultSpool, NDJSONStreamingResponse, stream_settings_from_env
+from datetime import datetime
+from contextlib import asynccontextmanager
 
 # Ruta al modelo entrenado
 MODEL_PATH = "models/trained_model.joblib"
 
-# Validar la existencia del modelo
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"No se encontró el modelo en {MODEL_PATH}. Por favor, entrena el modelo primero.")
+# Componentes que dependen del modelo: se crean en `start_serving` (ver `lifespan`)
+registry = None
+batcher = None
+prediction_cache = None
+log_sink = None
+EXPECTED_FEATURES = None
+
+# Duración de cada fase del arranque y estado de /health/ready (también en logs/api/startup.log)
+startup_tracker = tracker_from_env(MODULE_STARTED_AT)
+
+# Hilo que ejecuta `load_model` (ver `run_loader`)
+loader_thread = None
+
+
+def load_model():
+    """
+    Fases pesadas del arranque, fuera del bucle de eventos: importar pandas y sklearn, cargar
+    el modelo en el registro que permite recargarlo en caliente y calentar el motor compilado.
+    """
+    with startup_tracker.phase("heavy_imports"):
+        import pandas  # noqa: F401
+        import sklearn.ensemble  # noqa: F401
+        from model_registry import registry_from_env
+
+    # MODEL_FORMAT=mmap usa el artefacto compacto compartido entre workers
+    with startup_tracker.phase("model_load"):
+        loaded_registry = registry_from_env(MODEL_PATH)
+        loaded_registry.activate(loaded_registry.load())
+    return loaded_registry
+
+
+def warm_up(served):
+    """
+    Predicción de calentamiento por el mismo camino que /predict (empaquetado, motor y respuesta),
+    para que la primera solicitud real no pague inicializaciones.
+    """
+    record = {str(name): 0 for name in served.engine.feature_names_in_}
+    X = pack_features([record], served.engine.feature_names_in_)
+    build_response([record], served.engine.predict(X).tolist())
+
+
+async def run_loader():
+    """
+    Ejecuta `load_model` en un hilo daemon y espera su resultado sin bloquear el bucle de eventos.
+    La carga no se puede interrumpir; a diferencia de `asyncio.to_thread`, un hilo daemon no impide
+    que el proceso termine si el servidor se apaga antes de que acabe (ver `lifespan`).
+    """
+    global loader_thread
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target():
+        result = error = None
+        try:
+            result = load_model()
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            # El bucle ya se cerró: el servidor se apagó durante la carga
+            pass
+
+    loader_thread = threading.Thread(target=target, name="model-loader", daemon=True)
+    loader_thread.start()
+    return await future
+
+
+async def start_serving():
+    """
+    Carga el modelo y crea los componentes que dependen de él sin bloquear el servidor: mientras
+    tanto /health/live responde y /health/ready devuelve 503.
+    """
+    global registry, batcher, prediction_cache, log_sink, EXPECTED_FEATURES
+    try:
+        loaded_registry = await run_loader()
+
+        with startup_tracker.phase("components"):
+            # Agrupador opcional de solicitudes concurrentes (PREDICT_BATCHING=1); cada solicitud se
+            # evalúa con el modelo con el que empezó (ver `score_model`)
+            batcher = batcher_from_env(n_features=loaded_registry.current.engine.n_features_in_)
 
-# Cargar el modelo
-model = joblib.load(MODEL_PATH)
+            # Caché opcional de predicciones por fila (PREDICTION_CACHE=1), invalidada si cambia el modelo
+            prediction_cache = cache_from_env(loaded_registry.watch_path, model_version=loaded_registry.current.version)
+            if prediction_cache is not None:
+                loaded_registry.on_swap(lambda loaded: prediction_cache.set_model_version(loaded.version))
 
-# Validar las columnas esperadas
-EXPECTED_FEATURES = model.feature_names_in_
+            # Escritor en segundo plano de los logs de predicciones
+            log_sink = sink_from_env().start()
 
-# Ruta para guardar métricas del modelo
-METRICS_FILE = "logs/metrics.json"
+            # Contadores de los componentes opcionales que también se exponen en /metrics/prometheus
+            telemetry.register_gauges("api_model_registry", lambda: loaded_registry.info())
+            if batcher is not None:
+                telemetry.register_gauges("api_batcher", batcher.stats)
+            if prediction_cache is not None:
+                telemetry.register_gauges("api_prediction_cache", prediction_cache.stats)
+            telemetry.register_gauges("api_prediction_log", log_sink.stats)
+
+            # Validar las columnas esperadas (un modelo nuevo debe esperar las mismas)
+            EXPECTED_FEATURES = loaded_registry.current.engine.feature_names_in_
+            loaded_registry.start_watcher(float(os.getenv("MODEL_WATCH_INTERVAL_S", "0")))
+
+        with startup_tracker.phase("warmup"):
+            warm_up(loaded_registry.current)
+
+        # El registro se publica al final: las solicitudes solo ven un arranque completo
+        registry = loaded_registry
+        startup_tracker.mark_ready(model_version=registry.current.version)
+    except Exception as e:
+        startup_tracker.fail(e)
+
+# Al iniciar se carga el modelo en segundo plano (ver `start_serving`) y, si se pidió con
+# PROFILING_SAMPLE_RATE, se abre una sesión del perfilador; al apagar el servidor se escriben
+# los logs de predicciones pendientes. Si el modelo todavía se está cargando, se espera hasta
+# MODEL_LOAD_SHUTDOWN_TIMEOUT_S a que termine y después se abandona el hilo de carga
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loading = asyncio.create_task(start_serving())
+    if profiler is not None and float(os.getenv("PROFILING_SAMPLE_RATE", "0")) > 0:
+        duration = float(os.getenv("PROFILING_DURATION_S", "0"))
+        profiler.start(float(os.getenv("PROFILING_SAMPLE_RATE")), duration or None)
+    yield
+    loading.cancel()
+    if loader_thread is not None and loader_thread.is_alive():
+        timeout = float(os.getenv("MODEL_LOAD_SHUTDOWN_TIMEOUT_S", "5"))
+        await asyncio.to_thread(loader_thread.join, timeout)
+        if loader_thread.is_alive():
+            print(f"La carga del modelo no terminó en {timeout}s; el hilo de carga se abandona al apagar el servidor.")
+    if profiler is not None:
+        profiler.stop()
+    if registry is not None:
+        registry.stop_watcher()
+    if log_sink is not None:
+        log_sink.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Telemetría en memoria (solicitudes, errores y latencia por etapa), expuesta en /metrics/prometheus
+telemetry = Telemetry()
+app.add_middleware(TelemetryMiddleware, telemetry=telemetry)
+telemetry.register_gauges("api_startup", startup_tracker.stats)
+
+# Perfilador por muestreo opcional (PROFILING=1); sin él no se agrega ningún middleware
+profiler = profiler_from_env()
+if profiler is not None:
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+    telemetry.register_gauges("api_profiler", profiler.stats)
+
+# Token opcional para los endpoints de administración
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Tamaño de bloque y de línea para /predict/stream
+STREAM_SETTINGS = stream_settings_from_env()
 
 # Endpoint básico para verificar el estado
 @app.get("/", summary="Root endpoint", description="Verifica si la API está activa.")
 async def root():
     return {"message": "API para procesamiento de datos activa."}
 
+# Sondas de liveness y readiness
+@app.get(
+    "/health/live",
+    summary="Liveness",
+    description="Responde 200 mientras el proceso atiende solicitudes, aunque el modelo todavía se esté cargando."
+)
+async def health_live():
+    return {"status": "alive"}
+
+@app.get(
+    "/health/ready",
+    summary="Readiness",
+    description=(
+        "Responde 200 cuando el modelo está cargado y calentado; 503 mientras arranca o si el arranque falló. "
+        "Incluye la duración de cada fase del arranque."
+    ),
+)
+async def health_ready():
+    info = startup_tracker.info()
+    if not startup_tracker.ready:
+        status = "failed" if startup_tracker.error else "starting"
+        return JSONResponse(status_code=503, content={"status": status, **info})
+    return {"status": "ready", "model_version": registry.current.version, **info}
+
+# Registro del modelo; 503 hasta que termine el arranque
+def require_registry():
+    if registry is None:
+        detail = startup_tracker.error or "El modelo todavía se está cargando."
+        raise HTTPException(status_code=503, detail=detail)
+    return registry
+
 # Endpoint para realizar predicciones individuales o en lote
 @app.post(
     "/predict", 
     summary="Realiza predicciones",
     description="Realiza predicciones utilizando el modelo entrenado. Recibe una lista de registros como entrada."
 )
-async def predict(data: List[Dict]):
-    try:
-        # Convertir la entrada a un DataFrame
-        df = pd.DataFrame(data)
+async def predict(data: List[Dict], request: Request):
+    # Etapa `parse`: desde que llegó la solicitud hasta aquí (lectura del cuerpo, JSON y validación de FastAPI)
+    started = time.perf_counter()
+    telemetry.observe_stage("parse", started - request.scope.get("state", {}).get("started_at", started))
 
-        # Validar que todas las columnas esperadas estén presentes
-        missing_features = set(EXPECTED_FEATURES) - set(df.columns)
-        if missing_features:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Faltan las columnas necesarias para el modelo: {missing_features}",
-            )
+    # Todas las filas de la solicitud se evalúan con el mismo modelo, aunque se recargue en medio
+    served = require_registry().current
+    try:
+        # Camino rápido: empaquetar directamente en una matriz de NumPy, sin DataFrame
+        X = pack_features(data, EXPECTED_FEATURES)
+        if X is None:
+            return await predict_with_dataframe(data, served, started)
+        validated = time.perf_counter()
+        telemetry.observe_stage("validate", validated - started)
 
-        # Generar predicciones
-        predictions = model.predict(df[EXPECTED_FEATURES])
-        df["Prediction"] = predictions
+        predictions = (await score(X, served)).tolist()
+        predicted = time.perf_counter()
+        telemetry.observe_stage("predict", predicted - validated)
+        telemetry.observe_rows(len(predictions))
 
         # Guardar las predicciones en logs
-        save_prediction_logs(data, df["Prediction"].tolist())
+        save_prediction_logs(data, predictions, served.version)
+        logged = time.perf_counter()
+        telemetry.observe_stage("log_write", logged - predicted)
 
         # Retornar las predicciones
-        return JSONResponse(content=df.to_dict(orient="records"))
+        content = build_response(data, predictions)
+        telemetry.observe_stage("serialize", time.perf_counter() - logged)
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers={"X-Model-Version": served.version},
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Genera predicciones: primero la caché (si está habilitada) y luego el modelo para las filas faltantes
+async def score(X, served):
+    if prediction_cache is None:
+        return await score_model(X, served)
+
+    keys = prediction_cache.keys_for(X)
+    values, missing = prediction_cache.lookup(keys)
+    if missing:
+        computed = await score_model(X[missing], served)
+        prediction_cache.store([keys[i] for i in missing], computed)
+        for i, value in zip(missing, computed):
+            values[i] = value
+    return np.asarray(values)
+
+# Genera predicciones con el motor compilado, pasando por el agrupador si está habilitado
+async def score_model(X, served):
+    if batcher is not None:
+        return await batcher.submit(X, served.engine.predict)
+    return served.engine.predict(X)
+
+# Camino original con pandas: se usa para cargas irregulares y conserva los mensajes de error
+async def predict_with_dataframe(data: List[Dict], served, started: float):
+    # pandas ya se importó al arrancar (ver `load_model`); aquí solo se toma del caché de módulos
+    import pandas as pd
+
+    # Convertir la entrada a un DataFrame
+    df = pd.DataFrame(data)
+
+    # Validar que todas las columnas esperadas estén presentes
+    missing_features = set(EXPECTED_FEATURES) - set(df.columns)
+    if missing_features:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Faltan las columnas necesarias para el modelo: {missing_features}",
+        )
+    validated = time.perf_counter()
+    telemetry.observe_stage("validate", validated - started)
+
+    # Generar predicciones
+    predictions = await score(df[EXPECTED_FEATURES].to_numpy(), served)
+    df["Prediction"] = predictions
+    predicted = time.perf_counter()
+    telemetry.observe_stage("predict", predicted - validated)
+    telemetry.observe_rows(len(df))
+
+    # Guardar las predicciones en logs
+    save_prediction_logs(data, df["Prediction"].tolist(), served.version)
+    logged = time.perf_counter()
+    telemetry.observe_stage("log_write", logged - predicted)
+
+    # Retornar las predicciones
+    response = JSONResponse(content=df.to_dict(orient="records"), headers={"X-Model-Version": served.version})
+    telemetry.observe_stage("serialize", time.perf_counter() - logged)
+    return response
+
+# Endpoint para puntuar archivos grandes en NDJSON (un registro por línea)
+@app.post(
+    "/predict/stream",
+    summary="Realiza predicciones en streaming",
+    description=(
+        "Recibe NDJSON (un objeto JSON por línea con las columnas del modelo) y devuelve NDJSON con una línea "
+        "por registro, en el mismo orden. Las líneas inválidas se reportan como {\"line\": n, \"error\": ...} "
+        "sin detener el resto. El cuerpo se procesa en bloques de tamaño fijo, así la memoria no depende del "
+        "tamaño de la entrada."
+    ),
+)
+async def predict_stream(request: Request):
+    # Todo el flujo se evalúa con el mismo modelo, aunque se recargue en medio
+    served = require_registry().current
+    features = list(EXPECTED_FEATURES)
+    chunk_size = STREAM_SETTINGS["chunk_size"]
+
+    async def score_chunk(entries, records, rows):
+        # entries: por cada línea, el índice de su fila en `rows` o el mensaje de error
+        predictions = []
+        if rows:
+            predicted = time.perf_counter()
+            predictions = (await asyncio.to_thread(served.engine.predict, np.vstack(rows))).tolist()
+            telemetry.observe_stage("predict", time.perf_counter() - predicted)
+            telemetry.observe_rows(len(rows))
+            save_prediction_logs(records, predictions, served.version)
+
+        out = []
+        for line_no, entry in entries:
+            if isinstance(entry, int):
+                out.append(dumps_line({**records[entry], "Prediction": predictions[entry]}))
+            else:
+                out.append(dumps_line({"line": line_no, "error": entry}))
+        return b"".join(out)
+
+    async def produce(spool):
+        # Lee y puntúa la entrada sin esperar a que el cliente lea la respuesta (ver ResultSpool)
+        entries, records, rows = [], [], []
+        try:
+            async for line_no, line in iter_lines(request.stream(), STREAM_SETTINGS["max_line_bytes"]):
+                if line is None:
+                    entries.append((line_no, f"La línea supera el máximo de {STREAM_SETTINGS['max_line_bytes']} bytes."))
+                else:
+                    try:
+                        record, x = parse_record(line, features)
+                        entries.append((line_no, len(rows)))
+                        records.append(record)
+                        rows.append(x)
+                    except ValueError as e:
+                        entries.append((line_no, str(e)))
+
+                if len(entries) >= chunk_size:
+                    spool.write(await score_chunk(entries, records, rows))
+                    entries, records, rows = [], [], []
+
+            if entries:
+                spool.write(await score_chunk(entries, records, rows))
+        except Exception as e:
+            # El error se reporta al final del flujo; las líneas ya enviadas siguen siendo válidas
+            spool.write(dumps_line({"error": f"Error al procesar el flujo: {str(e)}"}))
+        finally:
+            spool.close()
+
+    async def results():
+        spool = ResultSpool(STREAM_SETTINGS["spool_memory_bytes"])
+        producer = asyncio.create_task(produce(spool))
+        try:
+            while True:
+                data = await spool.read()
+                if not data:
+                    break
+                yield data
+        finally:
+            producer.cancel()
+            spool.discard()
+
+    return NDJSONStreamingResponse(results(), headers={"X-Model-Version": served.version})
+
 # Endpoint para métricas del modelo
 @app.get(
     "/metrics",
     summary="Obtén métricas del modelo",
-    description="Devuelve las métricas actuales del modelo, como la precisión y la última actualización."
+    description=(
+        "Devuelve el modelo activo (versión, formato, número de árboles y cuándo se cargó) y los contadores "
+        "de recargas; las métricas de precisión sobre los logs están en la tabla `evaluations`."
+    ),
 )
 async def metrics():
-    try:
-        if not os.path.exists(METRICS_FILE):
-            return {"message": "No se encontraron métricas registradas."}
+    return require_registry().info()
 
-        with open(METRICS_FILE, "r") as f:
-            metrics_data = json.load(f)
+# Endpoint con la telemetría de la API en formato de texto de Prometheus
+@app.get(
+    "/metrics/prometheus",
+    summary="Telemetría en formato Prometheus",
+    description="Devuelve solicitudes, errores, latencias por etapa, filas por solicitud y versión del modelo en formato de texto de Prometheus."
+)
+async def prometheus_metrics():
+    model_version = registry.current.version if registry is not None else "none"
+    return PlainTextResponse(telemetry.render(model_version), media_type="text/plain; version=0.0.4")
 
-        return metrics_data
+# Endpoint con los contadores del agrupador de solicitudes
+@app.get(
+    "/metrics/batching",
+    summary="Obtén estadísticas del agrupador",
+    description="Devuelve la distribución de tamaños de lote y el tiempo de espera en cola del agrupador de /predict."
+)
+async def batching_metrics():
+    if batcher is None:
+        return {"message": "El agrupador de solicitudes no está habilitado (PREDICT_BATCHING=1)."}
+    return batcher.stats()
 
+# Endpoint con los contadores de la caché de predicciones
+@app.get(
+    "/metrics/cache",
+    summary="Obtén estadísticas de la caché",
+    description="Devuelve aciertos, fallos y expulsiones de la caché de predicciones."
+)
+async def cache_metrics():
+    if prediction_cache is None:
+        return {"message": "La caché de predicciones no está habilitada (PREDICTION_CACHE=1)."}
+    return prediction_cache.stats()
+
+# Verifica el token de administración cuando ADMIN_TOKEN está configurado
+def check_admin_token(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administración inválido.")
+
+# Endpoints de administración del modelo
+@app.get(
+    "/admin/model",
+    summary="Modelo activo",
+    description="Devuelve la versión del modelo activo, la del anterior en memoria y los contadores de recarga."
+)
+async def model_info(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    return require_registry().info()
+
+@app.post(
+    "/admin/model/reload",
+    summary="Recarga el modelo",
+    description="Carga y calienta el modelo desde disco fuera del camino de las solicitudes y lo activa de forma atómica."
+)
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    loaded_registry = require_registry()
+    try:
+        return await asyncio.to_thread(loaded_registry.reload)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener métricas: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al recargar el modelo: {str(e)}")
 
-# Función para guardar logs de predicciones
-def save_prediction_logs(request_data, predictions):
-    logs_dir = "logs/api"
-    os.makedirs(logs_dir, exist_ok=True)
-    log_file = os.path.join(logs_dir, "predictions.log")
+@app.post(
+    "/admin/model/rollback",
+    summary="Revierte el modelo",
+    description="Vuelve a activar el modelo anterior que se conserva en memoria."
+)
+async def rollback_model(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    try:
+        return require_registry().rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    log_entry = {
-        "request": request_data,
-        "predictions": predictions,
-        "timestamp": pd.Timestamp.now().isoformat(),
-    }
-    with open(log_file, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+# Endpoints de administración del perfilador
+PROFILER_DISABLED = {"message": "El perfilador no está habilitado (PROFILING=1)."}
+
+@app.get(
+    "/admin/profiler",
+    summary="Estado del perfilador",
+    description="Devuelve si hay una sesión de perfilado activa, la fracción de solicitudes perfiladas y las muestras acumuladas."
+)
+async def profiler_info(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    if profiler is None:
+        return PROFILER_DISABLED
+    return profiler.stats()
+
+@app.post(
+    "/admin/profiler/start",
+    summary="Inicia una sesión de perfilado",
+    description=(
+        "Perfila una fracción `rate` de las solicitudes (1 = todas) durante `duration_s` segundos, "
+        "o hasta llamar a /admin/profiler/stop si no se indica la duración."
+    ),
+)
+async def start_profiler(rate: float = 1.0, duration_s: Optional[float] = None, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    if profiler is None:
+        return PROFILER_DISABLED
+    try:
+        return profiler.start(rate, duration_s)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post(
+    "/admin/profiler/stop",
+    summary="Detiene el perfilador",
+    description="Termina la sesión de perfilado; las muestras acumuladas se conservan hasta descargarlas con `reset=true`."
+)
+async def stop_profiler(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    if profiler is None:
+        return PROFILER_DISABLED
+    return profiler.stop()
+
+@app.get(
+    "/admin/profiler/profile",
+    summary="Descarga el perfil",
+    description=(
+        "Descarga las pilas muestreadas en formato colapsado (una línea `hilo;marco;...;marco muestras`), "
+        "compatible con flamegraph.pl y speedscope. Con `reset=true` se vacían después de descargarlas."
+    ),
+)
+async def download_profile(reset: bool = False, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    if profiler is None:
+        return PROFILER_DISABLED
+    filename = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        profiler.collapsed(reset=reset),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-# Función para registrar métricas del modelo
-def save_metrics(accuracy: float):
+# Función para guardar logs de predicciones
+def save_prediction_logs(request_data, predictions, model_version=None):
     """
-    Guarda las métricas del modelo en un archivo JSON.
+    Encola el log de la predicción; el hilo de `log_sink` lo escribe en logs/api/predictions.log.
     """
-    os.makedirs(os.path.dirname(METRICS_FILE), exist_ok=True)
-
-    metrics_data = {
-        "accuracy": accuracy,
-        "last_updated": pd.Timestamp.now().isoformat(),
+    log_entry = {
+        "request": request_data,
+        "predictions": predictions,
+        "timestamp": datetime.now().isoformat(),
+        "model_version": model_version,
     }
+    log_sink.write(log_entry)
 
-    with open(METRICS_FILE, "w") as f:
-        json.dump(metrics_data, f)
-
-# Registrar métricas iniciales del modelo (si están disponibles)
-try:
-    save_metrics(accuracy=0.87)  # Cambia esto si tienes otra métrica calculada
-except Exception as e:
-    print(f"Error al guardar métricas iniciales: {e}")
\ No newline at end of file
+# Primera fase del arranque: importar este módulo (sin pandas, sklearn ni el modelo)
+startup_tracker.record("module_import", time.perf_counter() - MODULE_STARTED_AT)
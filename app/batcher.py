@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+# Límites de los histogramas (tamaño de lote en filas y espera en cola en milisegundos)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+QUEUE_DELAY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class MicroBatcher:
+    """
+    Agrupa las filas de solicitudes concurrentes a /predict en una sola llamada vectorizada al modelo.
+
+    Cada solicitud se encola y espera como máximo `max_wait_ms`; el lote se evalúa antes si
+    acumula `max_batch_size` filas. A cada solicitud se le devuelven solo sus propias filas.
+    El modelo se evalúa en el executor por defecto, así el bucle de eventos sigue atendiendo
+    otras solicitudes mientras se predice el lote.
+
+    Cada solicitud indica la función del modelo con el que empezó (`served.engine.predict`): si el
+    modelo se recarga durante la espera, las solicitudes de cada modelo se evalúan en lotes separados
+    y ninguna termina con un modelo distinto del que informa en X-Model-Version.
+    """
+
+    def __init__(self, max_wait_ms: float = 2.0, max_batch_size: int = 256, n_features: int = None):
+        self.n_features = n_features
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._pending_rows = 0
+        self._timer = None
+        # Lotes en evaluación (se guarda la referencia para que las tareas no se recolecten antes de terminar)
+        self._tasks = set()
+
+        # Contadores
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self.fallbacks = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_delay_counts = [0] * (len(QUEUE_DELAY_BUCKETS_MS) + 1)
+        self.queued = 0
+        self.queue_delay_total_ms = 0.0
+        self.queue_delay_max_ms = 0.0
+
+    async def submit(self, X, predict_fn) -> np.ndarray:
+        """
+        Encola las filas de una solicitud y espera sus predicciones, calculadas con `predict_fn`.
+        """
+        # Validar antes de encolar para que una solicitud inválida no arruine el lote completo
+        with np.errstate(over="ignore"):
+            X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Se esperaba una matriz 2D, pero se recibió un arreglo con {X.ndim} dimensiones.")
+        if self.n_features is not None and X.shape[1] != self.n_features:
+            raise ValueError(f"Se esperaban {self.n_features} columnas, pero se recibieron {X.shape[1]}.")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN, infinity or a value too large for dtype('float32').")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((X, future, time.perf_counter(), predict_fn))
+        self._pending_rows += X.shape[0]
+
+        if self._pending_rows >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, []
+        self._pending_rows = 0
+
+        now = time.perf_counter()
+        groups = {}
+        for X, future, enqueued_at, predict_fn in pending:
+            self._record_delay((now - enqueued_at) * 1000.0)
+            groups.setdefault(predict_fn, []).append((X, future))
+
+        # Un lote por modelo (normalmente uno solo; dos si el modelo cambió durante la espera)
+        loop = asyncio.get_running_loop()
+        for predict_fn, group in groups.items():
+            task = loop.create_task(self._score(predict_fn, group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, predict_fn, pending: list):
+        loop = asyncio.get_running_loop()
+        sizes = [X.shape[0] for X, _ in pending]
+        try:
+            predictions = await loop.run_in_executor(None, predict_fn, np.concatenate([X for X, _ in pending]))
+        except Exception:
+            # Si falla el lote completo, se evalúa cada solicitud por separado para aislar el error
+            self.fallbacks += 1
+            for X, future in pending:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(await loop.run_in_executor(None, predict_fn, X))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        self._record_batch(sum(sizes), len(pending))
+
+        # Repartir los resultados: cada solicitud recibe solo sus filas
+        offsets = np.cumsum(sizes)[:-1]
+        for (_, future), result in zip(pending, np.split(predictions, offsets)):
+            if not future.done():
+                future.set_result(result)
+
+    def _record_batch(self, n_rows: int, n_requests: int):
+        self.batches += 1
+        self.rows += n_rows
+        self.requests += n_requests
+        self.batch_size_counts[bisect_left(BATCH_SIZE_BUCKETS, n_rows)] += 1
+
+    def _record_delay(self, delay_ms: float):
+        self.queued += 1
+        self.queue_delay_total_ms += delay_ms
+        self.queue_delay_max_ms = max(self.queue_delay_max_ms, delay_ms)
+        self.queue_delay_counts[bisect_left(QUEUE_DELAY_BUCKETS_MS, delay_ms)] += 1
+
+    def stats(self) -> dict:
+        """
+        Devuelve los contadores de tamaño de lote y de espera en cola.
+        """
+        labels = [str(b) for b in BATCH_SIZE_BUCKETS] + ["+Inf"]
+        delay_labels = [str(b) for b in QUEUE_DELAY_BUCKETS_MS] + ["+Inf"]
+        return {
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "fallbacks": self.fallbacks,
+            "avg_batch_rows": self.rows / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(zip(labels, self.batch_size_counts)),
+            "queue_delay_ms_avg": self.queue_delay_total_ms / self.queued if self.queued else 0.0,
+            "queue_delay_ms_max": self.queue_delay_max_ms,
+            "queue_delay_ms_histogram": dict(zip(delay_labels, self.queue_delay_counts)),
+        }
+
+
+def batcher_from_env(n_features: int = None):
+    """
+    Crea el agrupador solo si está habilitado con PREDICT_BATCHING=1 (desactivado por defecto).
+    """
+    if os.getenv("PREDICT_BATCHING", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return MicroBatcher(
+        max_wait_ms=float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "2")),
+        max_batch_size=int(os.getenv("PREDICT_BATCH_MAX_SIZE", "256")),
+        n_features=n_features,
+    )
@@ -0,0 +1,350 @@
+"""
+Prueba de carga de la API de predicción.
+
+Repite contra POST /predict las solicitudes reales (por defecto, las de logs/api/predictions.log;
+`--replay` acepta otros archivos JSONL) y solicitudes sintéticas armadas con filas de data/heart.csv, para
+varios tamaños de lote y niveles de concurrencia. Por escenario reporta solicitudes y filas por
+segundo, latencia p50/p95/p99, errores y RSS máxima del proceso que atiende las solicitudes.
+
+La API se puede probar en el mismo proceso (transporte ASGI de httpx, sin red) o en un uvicorn
+ya levantado (`--url`); en ese caso `--server-pid` permite medir la RSS del servidor. El resultado
+se guarda en JSON y `--compare` lo contrasta con una corrida anterior: si algún escenario pierde
+más de `--max-regression` de rendimiento o de p95, el comando termina con código 1.
+
+En el modo en proceso los logs de predicciones van a un archivo temporal (PREDICTION_LOG_FILE) para
+no mezclar el tráfico de la prueba con el real; al probar un uvicorn conviene levantarlo igual.
+
+Uso (desde el directorio de la API):
+    python -m benchmarks.api_load --batch-sizes 1 10 100 --concurrency 1 8 32
+    python -m benchmarks.api_load --url http://localhost:8000 --server-pid 1234
+    python -m benchmarks.api_load --compare logs/benchmarks/api_load-20241116-103000.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# httpx solo se usa para las pruebas de carga
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(APP_DIR)
+OUTPUT_DIR = os.path.join("logs", "benchmarks")
+
+
+def read_rss_kb(pid: int = None) -> int:
+    """
+    RSS actual de un proceso desde /proc (solo Linux); 0 si no se puede leer.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler:
+    """
+    Mide la RSS máxima de un proceso durante un escenario, muestreando en un hilo cada `interval` segundos.
+    """
+
+    def __init__(self, pid: int = None, interval: float = 0.01):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak_kb = read_rss_kb(self.pid)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, read_rss_kb(self.pid))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, read_rss_kb(self.pid))
+
+
+def _records(payload) -> list:
+    """
+    Registros de una solicitud: una lista de diccionarios, un diccionario suelto o una línea de log
+    (`{"request": [...], ...}`). Lo que no tiene forma de solicitud se descarta.
+    """
+    if isinstance(payload, dict) and "request" in payload:
+        payload = payload["request"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if isinstance(payload, list) and payload and all(isinstance(record, dict) for record in payload):
+        return payload
+    return []
+
+
+def load_replay_payloads(paths: list, features: list) -> list:
+    """
+    Solicitudes reales de archivos JSONL; se conservan solo las que traen todas las columnas del modelo.
+    """
+    payloads = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Advertencia: no se encontró {path}; se omite.")
+            continue
+        found = skipped = 0
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records = _records(json.loads(line))
+                except ValueError:
+                    records = []
+                if records and all(set(features).issubset(record) for record in records):
+                    payloads.append(records)
+                    found += 1
+                else:
+                    skipped += 1
+        print(f"{path}: {found} solicitudes para repetir ({skipped} líneas sin forma de solicitud).")
+    return payloads
+
+
+def load_synthetic_records(csv_path: str, features: list) -> list:
+    """
+    Filas de heart.csv codificadas como las envían los clientes (mismas categorías que el entrenamiento).
+    """
+    import pandas as pd
+    from heart_failure_project.utils.encoding import CATEGORICAL_MAPPINGS
+
+    df = pd.read_csv(csv_path)
+    for column, mapping in CATEGORICAL_MAPPINGS.items():
+        df[column] = df[column].map(mapping)
+    return json.loads(df[features].to_json(orient="records"))
+
+
+def synthetic_payloads(records: list, batch_size: int, count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [rng.choices(records, k=batch_size) for _ in range(count)]
+
+
+async def run_scenario(client, payloads: list, concurrency: int, requests: int, warmup: int, server_pid: int = None) -> dict:
+    """
+    Envía `requests` solicitudes (recorriendo `payloads` en orden) con `concurrency` clientes simultáneos.
+    """
+    for payload in payloads[:warmup]:
+        await client.post("/predict", json=payload)
+
+    latencies = []
+    errors = 0
+    rows = 0
+    next_index = 0
+
+    async def user():
+        nonlocal errors, rows, next_index
+        while next_index < requests:
+            payload = payloads[next_index % len(payloads)]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post("/predict", json=payload)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if ok:
+                rows += len(payload)
+            else:
+                errors += 1
+
+    with RSSSampler(server_pid) as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rows": rows,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "rows_per_s": rows / elapsed,
+        "latency_ms": {
+            "mean": float(latencies_ms.mean()),
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+            "max": float(latencies_ms.max()),
+        },
+        "peak_rss_mb": rss.peak_kb / 1024 if rss.peak_kb else None,
+    }
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        response = await client.get("/health/ready")
+        if response.status_code == 200:
+            return
+        if response.json().get("status") == "failed" or time.perf_counter() > deadline:
+            raise RuntimeError(f"La API no quedó lista: {response.json()}")
+        await asyncio.sleep(0.05)
+
+
+async def run_suite(args) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        lifespan = None
+        server_pid = args.server_pid
+        target = args.url
+        features = None
+    else:
+        # La API se importa en este proceso: sus logs van a un archivo temporal
+        os.environ.setdefault("PREDICTION_LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="api_load_"), "predictions.log"))
+        import asgi
+
+        lifespan = asgi.app.router.lifespan_context(asgi.app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.app), base_url="http://asgi", timeout=args.timeout)
+        server_pid = None
+        target = "asgi"
+        # El modelo se carga en segundo plano: se espera a que /health/ready responda 200
+        await wait_until_ready(client, args.timeout)
+        features = [str(name) for name in asgi.EXPECTED_FEATURES]
+
+    try:
+        if features is None:
+            import pandas as pd
+
+            # Columnas del modelo: las de heart.csv salvo la etiqueta
+            features = [column for column in pd.read_csv(args.data, nrows=0).columns if column != "HeartDisease"]
+
+        replay = load_replay_payloads(args.replay, features)
+        synthetic = load_synthetic_records(args.data, features)
+
+        scenarios = []
+        plans = []
+        if replay:
+            plans += [("replay", None, concurrency, replay) for concurrency in args.concurrency]
+        for batch_size in args.batch_sizes:
+            payloads = synthetic_payloads(synthetic, batch_size, min(args.requests, 1000), seed=batch_size)
+            plans += [("synthetic", batch_size, concurrency, payloads) for concurrency in args.concurrency]
+
+        for source, batch_size, concurrency, payloads in plans:
+            result = await run_scenario(client, payloads, concurrency, args.requests, args.warmup, server_pid)
+            result.update({"source": source, "batch_size": batch_size, "concurrency": concurrency})
+            scenarios.append(result)
+            print(
+                f"{source:>9} lote={str(batch_size or '-'):>4} concurrencia={concurrency:>3}: "
+                f"{result['requests_per_s']:8.1f} sol/s {result['rows_per_s']:9.1f} filas/s  "
+                f"p50 {result['latency_ms']['p50']:7.2f} ms  p95 {result['latency_ms']['p95']:7.2f} ms  "
+                f"p99 {result['latency_ms']['p99']:7.2f} ms  errores {result['errors']}  "
+                f"RSS máx {result['peak_rss_mb'] or 0:.1f} MB"
+            )
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    return {"meta": run_metadata(args, target), "scenarios": scenarios}
+
+
+def run_metadata(args, target: str) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "target": target,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "requests_per_scenario": args.requests,
+        "env": {name: value for name, value in os.environ.items() if name.startswith(("PREDICT", "MODEL_", "PREDICTION_"))},
+    }
+
+
+def scenario_key(scenario: dict) -> tuple:
+    return scenario["source"], scenario["batch_size"], scenario["concurrency"]
+
+
+def compare(current: dict, previous: dict, max_regression: float) -> list:
+    """
+    Escenarios que empeoraron más de `max_regression` (fracción) en solicitudes por segundo o en p95.
+    """
+    if current["meta"]["target"] != previous["meta"]["target"]:
+        print(
+            f"Advertencia: se comparan corridas contra destinos distintos "
+            f"({previous['meta']['target']} y {current['meta']['target']})."
+        )
+    previous_by_key = {scenario_key(scenario): scenario for scenario in previous["scenarios"]}
+    regressions = []
+    for scenario in current["scenarios"]:
+        before = previous_by_key.get(scenario_key(scenario))
+        if before is None:
+            continue
+        throughput = scenario["requests_per_s"] / before["requests_per_s"] - 1
+        p95 = scenario["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1
+        print(f"{scenario_key(scenario)}: rendimiento {throughput:+.1%}, p95 {p95:+.1%}")
+        if throughput < -max_regression or p95 > max_regression:
+            regressions.append({"scenario": scenario_key(scenario), "throughput_change": throughput, "p95_change": p95})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de POST /predict.")
+    parser.add_argument("--url", default=None, help="URL de un uvicorn ya levantado; sin ella, la API se prueba en proceso.")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID del servidor para medir su RSS (mismo equipo).")
+    parser.add_argument("--replay", nargs="*", default=[os.path.join("logs", "api", "predictions.log")], help="Archivos JSONL con solicitudes reales.")
+    parser.add_argument("--data", default=os.path.join("data", "heart.csv"), help="CSV para las solicitudes sintéticas.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Solicitudes por escenario.")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default=None, help="Ruta del JSON de resultados (por defecto en logs/benchmarks/).")
+    parser.add_argument("--compare", default=None, help="JSON de una corrida anterior para detectar regresiones.")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if httpx is None:
+        sys.exit("httpx no está instalado: pip install httpx")
+    sys.path.insert(0, APP_DIR)
+
+    report = asyncio.run(run_suite(args))
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"api_load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {output}.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print(f"Regresiones de más de {args.max_regression:.0%}: {regressions}")
+            sys.exit(1)
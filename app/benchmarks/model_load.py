@@ -0,0 +1,125 @@
+"""
+Compara la carga del modelo con joblib contra el artefacto compacto mapeado en memoria.
+
+Lanza varios procesos (como los workers de uvicorn) que cargan el modelo al mismo tiempo y
+reporta, por modo, el tiempo de carga y la memoria de cada proceso: RSS total, RSS anónima
+(privada del proceso) y PSS (memoria proporcional, que reparte las páginas compartidas).
+
+Uso (desde el directorio de la API):
+    python -m benchmarks.model_load --workers 4
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_memory_kb() -> dict:
+    """
+    Lee RSS, RSS anónima/de archivos y PSS desde /proc (solo Linux).
+    """
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                memory[key] = int(value.split()[0])
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["Pss"] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+
+def worker(mode: str, model_path: str, artifact_dir: str, barrier, results):
+    sys.path.insert(0, APP_DIR)
+    import numpy as np
+    from forest_engine import CompiledForest
+
+    baseline = read_memory_kb()
+    started = time.perf_counter()
+    if mode == "joblib":
+        import joblib
+
+        engine = CompiledForest.from_sklearn(joblib.load(model_path))
+    else:
+        engine = CompiledForest.from_artifact(artifact_dir, mmap_mode="r")
+    engine.predict(np.zeros((1, engine.n_features_in_)))
+    load_s = time.perf_counter() - started
+
+    # Medir cuando todos los workers tienen el modelo cargado, para que PSS refleje lo compartido
+    barrier.wait()
+    memory = read_memory_kb()
+    barrier.wait()
+    results.put({
+        "mode": mode,
+        "load_s": load_s,
+        "rss_mb": memory.get("VmRSS", 0) / 1024,
+        "rss_anon_mb": memory.get("RssAnon", 0) / 1024,
+        "pss_mb": memory.get("Pss", 0) / 1024,
+        "model_rss_anon_mb": (memory.get("RssAnon", 0) - baseline.get("RssAnon", 0)) / 1024,
+    })
+
+
+def run(mode: str, workers: int, model_path: str, artifact_dir: str) -> dict:
+    context = mp.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, model_path, artifact_dir, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def mean(key):
+        return sum(row[key] for row in rows) / len(rows)
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "load_s_mean": mean("load_s"),
+        "rss_mb_mean": mean("rss_mb"),
+        "rss_anon_mb_mean": mean("rss_anon_mb"),
+        "model_rss_anon_mb_mean": mean("model_rss_anon_mb"),
+        "pss_mb_total": sum(row["pss_mb"] for row in rows),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la carga joblib contra el artefacto mapeado en memoria.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model-path", default="models/trained_model.joblib")
+    parser.add_argument("--artifact-dir", default=os.path.join("models", "compiled_model"))
+    parser.add_argument("--output", default=None, help="Ruta opcional para guardar el resultado en JSON.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, APP_DIR)
+    if not os.path.exists(os.path.join(args.artifact_dir, "metadata.json")):
+        # Exportar el artefacto a partir del joblib si todavía no existe
+        import joblib
+        from heart_failure_project.utils.forest_artifact import save_forest_artifact, file_version
+
+        print(f"Exportando el artefacto compacto en {args.artifact_dir}...")
+        save_forest_artifact(joblib.load(args.model_path), args.artifact_dir, version=file_version(args.model_path))
+
+    report = [run(mode, args.workers, args.model_path, args.artifact_dir) for mode in ("joblib", "mmap")]
+    for row in report:
+        print(
+            f"{row['mode']:>6}: carga {row['load_s_mean'] * 1000:.1f} ms, RSS {row['rss_mb_mean']:.1f} MB, "
+            f"RSS anónima del modelo {row['model_rss_anon_mb_mean']:.1f} MB, "
+            f"PSS total ({row['workers']} workers) {row['pss_mb_total']:.1f} MB"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+
+# orjson es opcional: si no está instalado se usa el módulo json estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tipos que se copian tal cual a la respuesta (bool es subclase de int, se trata aparte)
+_SCALAR_TYPES = (int, float, str)
+
+
+def pack_features(data, features):
+    """
+    Valida la carga de /predict y la empaqueta directamente en una matriz de NumPy preasignada,
+    con las columnas en el orden de `features`.
+
+    Devuelve None cuando la carga no es "regular" (lista vacía, columnas faltantes, tipos mezclados
+    o valores no numéricos); en ese caso /predict usa el camino con pandas, que conserva el
+    comportamiento y los mensajes de error de siempre.
+    """
+    if not data:
+        return None
+
+    keys = data[0].keys()
+    column_types = {}
+    X = np.empty((len(data), len(features)), dtype=np.float64)
+    for i, row in enumerate(data):
+        if not isinstance(row, dict) or row.keys() != keys:
+            return None
+        for j, feature in enumerate(features):
+            value = row.get(feature)
+            if type(value) not in (int, float):
+                return None
+            X[i, j] = value
+
+        # pandas unifica el tipo de cada columna; para responder igual exigimos un solo tipo por columna
+        for key, value in row.items():
+            value_type = type(value)
+            if value_type not in _SCALAR_TYPES:
+                return None
+            if column_types.setdefault(key, value_type) is not value_type:
+                return None
+
+    return X
+
+
+def build_response(data, predictions) -> bytes:
+    """
+    Construye el cuerpo JSON de la respuesta (cada registro con su "Prediction") sin pasar por pandas.
+    """
+    records = [{**row, "Prediction": prediction} for row, prediction in zip(data, predictions)]
+    if orjson is not None:
+        return orjson.dumps(records)
+    return json.dumps(records, separators=(",", ":")).encode("utf-8")
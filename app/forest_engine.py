@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+# El recorrido vive junto al artefacto para que los bloques de Mage lo usen sin depender de la API
+from heart_failure_project.utils.compiled_forest import CompiledForest
+
+
+def resolve_path(path: str) -> str:
+    """
+    Busca una ruta relativa en el directorio actual, junto a este archivo o en la raíz del repositorio.
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    for base in (os.getcwd(), app_dir, os.path.dirname(app_dir)):
+        candidate = os.path.join(base, path)
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"No se encontró {path}.")
+
+
+def check_parity(model, engine: CompiledForest, data_path: str = "data/test_data.csv") -> int:
+    """
+    Verifica que el motor compilado produzca exactamente las mismas probabilidades y predicciones
+    que el modelo de sklearn sobre los datos de prueba, y que rechace valores no finitos igual que sklearn.
+    Devuelve el número de filas comparadas.
+    """
+    import pandas as pd
+
+    data = pd.read_csv(resolve_path(data_path))
+    X = data[list(model.feature_names_in_)]
+
+    expected_proba = model.predict_proba(X)
+    expected_pred = model.predict(X)
+    proba = engine.predict_proba(X.to_numpy())
+    pred = engine.predict(X.to_numpy())
+
+    if not np.array_equal(expected_proba, proba):
+        raise AssertionError("Las probabilidades del motor compilado no coinciden con las de sklearn.")
+    if not np.array_equal(expected_pred, pred):
+        raise AssertionError("Las predicciones del motor compilado no coinciden con las de sklearn.")
+
+    # Fila por fila, como llegan las solicitudes pequeñas a /predict
+    for i in range(len(X)):
+        if engine.predict(X.iloc[[i]].to_numpy())[0] != expected_pred[i]:
+            raise AssertionError(f"La predicción de la fila {i} no coincide con la de sklearn.")
+
+    # Los valores nulos, NaN o infinitos deben rechazarse en lugar de producir una predicción
+    for bad_value in (np.nan, np.inf, -np.inf, 1e40):
+        bad_row = X.iloc[[0]].astype(float).to_numpy()
+        bad_row[0, 0] = bad_value
+        try:
+            engine.predict(bad_row)
+        except ValueError:
+            continue
+        raise AssertionError(f"El motor compilado aceptó el valor no finito {bad_value}.")
+
+    return len(X)
+
+
+# Prueba de paridad contra sklearn: python forest_engine.py [ruta_modelo] [ruta_datos]
+if __name__ == "__main__":
+    import sys
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "models/trained_model.joblib"
+    data_path = sys.argv[2] if len(sys.argv) > 2 else "data/test_data.csv"
+
+    model = joblib.load(resolve_path(model_path))
+    # La paridad exacta con sklearn solo se cumple en float64
+    engine = CompiledForest.from_sklearn(model, precision="float64")
+    n_rows = check_parity(model, engine, data_path)
+    print(f"Paridad verificada: {n_rows} filas con predicciones idénticas a sklearn.")
@@ -3,28 +3,66 @@ if 'data_loader' not in globals():
 if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
+import os
+import tracemalloc
+
 import pandas as pd
+from heart_failure_project.utils import encoding, schema
+from heart_failure_project.utils.block_cache import cached_block
+from heart_failure_project.utils.schema import read_heart_csv
 
 @data_loader
+@cached_block(
+    input_files=['data/heart.csv'],
+    params=['load_mode', 'chunksize'],
+    env=['LOAD_DATA_MODE', 'LOAD_DATA_CHUNKSIZE'],
+    modules=[encoding, schema],
+)
 def load_data(*args, **kwargs):
     """
     Carga datos desde un archivo CSV local.
 
+    Con `load_mode='schema'` (variable del pipeline o LOAD_DATA_MODE) usa tipos explícitos
+    (enteros angostos, `category` y float32) y, si `chunksize` (o LOAD_DATA_CHUNKSIZE) es mayor
+    que cero, lee el archivo por partes en lugar de hacerlo de una vez.
+
     Returns:
         DataFrame con los datos cargados.
     """
     # Ruta al archivo CSV
     csv_path = 'data/heart.csv'
 
+    load_mode = kwargs.get('load_mode', os.getenv('LOAD_DATA_MODE', 'default')).lower()
+    if load_mode not in ('default', 'schema'):
+        raise ValueError(f"Modo de carga no soportado: '{load_mode}'. Use 'default' o 'schema'.")
+    chunksize = int(kwargs.get('chunksize', os.getenv('LOAD_DATA_CHUNKSIZE', '0')))
+
     # Carga el dataset
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
     try:
-        data = pd.read_csv(csv_path)
-        print(f"Datos cargados exitosamente: {data.shape[0]} filas, {data.shape[1]} columnas.")
+        if load_mode == 'default':
+            data = pd.read_csv(csv_path)
+        elif chunksize > 0:
+            # Solo una parte del texto del CSV está en memoria a la vez
+            data = pd.concat(read_heart_csv(csv_path, chunksize=chunksize), ignore_index=True)
+        else:
+            data = read_heart_csv(csv_path)
+        _, peak = tracemalloc.get_traced_memory()
+        print(
+            f"Datos cargados exitosamente: {data.shape[0]} filas, {data.shape[1]} columnas "
+            f"(memoria pico {peak / 2**20:.1f} MB, DataFrame {data.memory_usage(deep=True).sum() / 2**20:.1f} MB)."
+        )
         return data
     except FileNotFoundError as e:
         raise FileNotFoundError(f"No se encontró el archivo en la ruta especificada: {csv_path}")
     except Exception as e:
         raise ValueError(f"Error al cargar el archivo CSV: {str(e)}")
+    finally:
+        if not tracing:
+            tracemalloc.stop()
 
 @test
 def test_output(output, *args) -> None:
@@ -33,4 +71,4 @@ def test_output(output, *args) -> None:
     """
     assert output is not None, 'La salida es indefinida'
     assert isinstance(output, pd.DataFrame), 'La salida debe ser un DataFrame'
-    assert not output.empty, 'El DataFrame está vacío'
\ No newline at end of file
+    assert not output.empty, 'El DataFrame está vacío'
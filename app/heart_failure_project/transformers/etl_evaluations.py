@@ -1,17 +1,5 @@
-import psycopg2
-import pandas as pd
-from psycopg2.extras import execute_values
-from sklearn.metrics import roc_auc_score, precision_score, recall_score, accuracy_score
-import json
-
-# Definir DB_CONFIG
-DB_CONFIG = {
-    "dbname": "heartDB",
-    "user": "test",
-    "password": "test123",
-    "host": "heartDB",  # Nombre del servicio en Docker
-    "port": 5432,       # Puerto interno del contenedor PostgreSQL
-}
+from heart_failure_project.utils.db import connection
+from heart_failure_project.utils.prediction_logs import LABELLED_LOGS_SQL, committed_log_id
 
 # Importar los decoradores si no están ya en el entorno global
 if 'transformer' not in globals():
@@ -19,87 +7,107 @@ if 'transformer' not in globals():
 if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
-def calculate_metrics(y_true, y_pred):
+# Conteos acumulados de la matriz de confusión y el último id de `prediction_logs` ya contado
+COUNTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS evaluation_counts (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_log_id BIGINT NOT NULL DEFAULT 0,
+    tp BIGINT NOT NULL DEFAULT 0,
+    fp BIGINT NOT NULL DEFAULT 0,
+    tn BIGINT NOT NULL DEFAULT 0,
+    fn BIGINT NOT NULL DEFAULT 0,
+    skipped BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+INSERT INTO evaluation_counts (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+"""
+
+# Cuenta en PostgreSQL, sobre los logs nuevos, la etiqueta real contra la primera predicción.
+# Los logs sin etiqueta o sin predicciones se omiten.
+NEW_COUNTS_SQL = "WITH" + LABELLED_LOGS_SQL + """
+SELECT
+    COUNT(*) FILTER (WHERE is_positive AND predicted_positive) AS tp,
+    COUNT(*) FILTER (WHERE NOT is_positive AND predicted_positive) AS fp,
+    COUNT(*) FILTER (WHERE NOT is_positive AND NOT predicted_positive) AS tn,
+    COUNT(*) FILTER (WHERE is_positive AND NOT predicted_positive) AS fn,
+    COUNT(*) FILTER (WHERE is_positive IS NULL) AS skipped,
+    COUNT(*) AS new_logs
+FROM labelled_logs;
+"""
+
+
+def calculate_metrics(tp, fp, tn, fn):
     """
-    Calcula las métricas de evaluación para un modelo.
+    Calcula las métricas de evaluación a partir de la matriz de confusión.
+
+    Con predicciones binarias, el AUC de sklearn es el promedio de la sensibilidad y la especificidad.
     """
+    positives = tp + fn
+    negatives = tn + fp
+    if positives == 0 or negatives == 0:
+        raise ValueError("Se necesitan registros de ambas clases para calcular el AUC.")
+
+    recall = tp / positives
+    specificity = tn / negatives
     return {
-        "auc": roc_auc_score(y_true, y_pred),
-        "precision": precision_score(y_true, y_pred),
-        "recall": recall_score(y_true, y_pred),
-        "accuracy": accuracy_score(y_true, y_pred),
+        "auc": (recall + specificity) / 2,
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": recall,
+        "accuracy": (tp + tn) / (positives + negatives),
     }
 
+
 @transformer
 def transform(data, *args, **kwargs):
     """
-    Extrae logs de predicciones de la base de datos, calcula métricas y las guarda en la tabla `evaluations`.
+    Actualiza los conteos acumulados de la matriz de confusión con los logs nuevos de `prediction_logs`,
+    calcula las métricas sobre todos los logs y las guarda en la tabla `evaluations`.
     """
-    conn = None
-    cursor = None
     try:
-        # Conectar a la base de datos
-        print(f"Conectando a la base de datos en {DB_CONFIG['host']}:{DB_CONFIG['port']}...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # Obtener registros de `prediction_logs`
-        cursor.execute("SELECT request, predictions FROM prediction_logs;")
-        logs = cursor.fetchall()
-
-        print(f"Se encontraron {len(logs)} registros en `prediction_logs`.")
-
-        # Procesar los logs
-        y_true = []
-        y_pred = []
-
-        for log in logs:
-            # Verificar el tipo de datos y deserializar si es necesario
-            if isinstance(log[0], str):
-                request = json.loads(log[0])  # Convierte la cadena JSON a un dict o lista
-            else:
-                request = log[0]  # Ya es un dict o lista
-
-            if isinstance(log[1], str):
-                predictions = json.loads(log[1])  # Convierte la cadena JSON a una lista
-            else:
-                predictions = log[1]  # Ya es una lista
-
-            # Manejar el caso en que 'request' es una lista
-            if isinstance(request, list):
-                request_data = request[0]
-            else:
-                request_data = request
-
-            # Validar que 'HeartDisease' está presente
-            if "HeartDisease" not in request_data:
-                print(f"Advertencia: 'HeartDisease' no está presente en el registro: {request_data}")
-                continue  # Saltar este registro
-
-            # Validar 'predictions'
-            if not isinstance(predictions, list) or len(predictions) == 0:
-                print(f"Advertencia: 'predictions' no es una lista o está vacía: {predictions}")
-                continue  # Saltar este registro
-
-            # Agregar las predicciones y valores reales
-            y_true.append(request_data["HeartDisease"])
-            y_pred.append(predictions[0])  # Primera predicción
-
-        # Verificar que hay datos para calcular métricas
-        if len(y_true) == 0:
-            raise ValueError("No hay datos suficientes para calcular las métricas.")
-
-        # Calcular las métricas
-        metrics = calculate_metrics(y_true, y_pred)
-        print(f"Métricas calculadas: {metrics}")
-
-        # Insertar métricas en la tabla `evaluations`
-        query = """
-        INSERT INTO evaluations (timestamp, auc, precision, recall, accuracy)
-        VALUES (NOW(), %(auc)s, %(precision)s, %(recall)s, %(accuracy)s);
-        """
-        cursor.execute(query, metrics)
-        conn.commit()
+        # Hasta dónde se puede contar sin saltear logs que todavía no se confirmaron
+        max_log_id = committed_log_id()
+
+        # La conexión confirma la transacción al salir del bloque (conteos y métricas juntos)
+        with connection() as conn, conn.cursor() as cursor:
+            # Leer los conteos acumulados (bloqueados hasta el commit para evitar corridas simultáneas)
+            cursor.execute(COUNTS_TABLE_SQL)
+            cursor.execute("SELECT last_log_id, tp, fp, tn, fn, skipped FROM evaluation_counts WHERE id = 1 FOR UPDATE;")
+            last_log_id, tp, fp, tn, fn, skipped = cursor.fetchone()
+
+            # Contar solo los registros nuevos de `prediction_logs`
+            cursor.execute(NEW_COUNTS_SQL, {"last_log_id": last_log_id, "max_log_id": max_log_id})
+            new_tp, new_fp, new_tn, new_fn, new_skipped, new_logs = cursor.fetchone()
+
+            print(f"Se encontraron {new_logs} registros nuevos en `prediction_logs`.")
+            if new_skipped:
+                print(f"Advertencia: se omitieron {new_skipped} registros sin 'HeartDisease' o sin predicciones.")
+
+            tp, fp, tn, fn, skipped = tp + new_tp, fp + new_fp, tn + new_tn, fn + new_fn, skipped + new_skipped
+
+            # Verificar que hay datos para calcular métricas
+            if tp + fp + tn + fn == 0:
+                raise ValueError("No hay datos suficientes para calcular las métricas.")
+
+            # Calcular las métricas
+            metrics = calculate_metrics(tp, fp, tn, fn)
+            print(f"Métricas calculadas: {metrics}")
+
+            # Guardar los conteos y las métricas en la misma transacción
+            cursor.execute(
+                """
+                UPDATE evaluation_counts
+                SET last_log_id = %s, tp = %s, fp = %s, tn = %s, fn = %s, skipped = %s, updated_at = NOW()
+                WHERE id = 1;
+                """,
+                (max(last_log_id, max_log_id), tp, fp, tn, fn, skipped)
+            )
+
+            # Insertar métricas en la tabla `evaluations`
+            query = """
+            INSERT INTO evaluations (timestamp, auc, precision, recall, accuracy)
+            VALUES (NOW(), %(auc)s, %(precision)s, %(recall)s, %(accuracy)s);
+            """
+            cursor.execute(query, metrics)
 
         print("Métricas insertadas en la tabla `evaluations` con éxito.")
 
@@ -107,29 +115,21 @@ def transform(data, *args, **kwargs):
         print(f"Error en el ETL de evaluaciones: {e}")
         raise e  # Vuelve a lanzar la excepción
 
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
 @test
 def test_output(*args, **kwargs) -> None:
     """
     Prueba para validar que las métricas se insertaron correctamente.
     """
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
+    with connection() as conn, conn.cursor() as cursor:
         cursor.execute("SELECT COUNT(*) FROM evaluations;")
         count = cursor.fetchone()[0]
 
         assert count > 0, "No se encontraron registros en la tabla `evaluations`."
-        print(f"Prueba pasada: Se encontraron {count} registros en la tabla `evaluations`.")
 
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+        # Los conteos acumulados no pueden superar los logs ya contados
+        cursor.execute("SELECT last_log_id, tp + fp + tn + fn + skipped FROM evaluation_counts WHERE id = 1;")
+        last_log_id, counted = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM prediction_logs WHERE id <= %s;", (last_log_id,))
+        assert counted <= cursor.fetchone()[0], "Los conteos de `evaluation_counts` superan los logs existentes."
+
+        print(f"Prueba pasada: Se encontraron {count} registros en la tabla `evaluations`.")
@@ -3,63 +3,202 @@ if 'transformer' not in globals():
 if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
-import psycopg2
 import os
+import glob
+import hashlib
 import json
+import re
+import time
 from datetime import datetime
 
-DB_CONFIG = {
-    'dbname': 'heartDB',
-    'user': 'test',
-    'password': 'test123',
-    'host': 'heartDB',  # Cambiar según el servicio Docker
-    'port': '5432',     # Puerto interno de PostgreSQL
-}
+from heart_failure_project.utils.db import connection, copy_rows
+
+# Campos que debe tener cada línea del log
+LOG_FIELDS = {'timestamp', 'request', 'predictions'}
+
+# Posición hasta la que ya se cargó cada archivo de logs, identificado por su inodo (al rotar, la API
+# renombra el archivo y el inodo se conserva) y por el hash de su primera línea (un archivo nuevo
+# puede reutilizar el inodo de uno borrado)
+CHECKPOINT_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS etl_log_checkpoints (
+    inode BIGINT PRIMARY KEY,
+    path TEXT NOT NULL,
+    "offset" BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+ALTER TABLE etl_log_checkpoints ADD COLUMN IF NOT EXISTS head TEXT;
+"""
+
+# Archivos rotados por la API: predictions.log.AAAAMMDDHH y, si ya existía, predictions.log.AAAAMMDDHH.n
+ROTATED_SUFFIX = re.compile(r'^(\d{10})(?:\.(\d+))?$')
+
+# Primera carga con filas ya en la tabla (cargadas antes de existir los checkpoints): se cargan en una
+# tabla temporal y solo se insertan las que no estén ya en `prediction_logs`
+STAGING_TABLE_SQL = """
+CREATE TEMP TABLE etl_logs_staging ON COMMIT DROP AS
+SELECT timestamp, request, predictions FROM prediction_logs WITH NO DATA;
+"""
+INSERT_STAGED_SQL = """
+INSERT INTO prediction_logs (timestamp, request, predictions)
+SELECT s.timestamp, s.request, s.predictions
+FROM etl_logs_staging s
+WHERE NOT EXISTS (
+    SELECT 1 FROM prediction_logs p
+    WHERE p.timestamp = s.timestamp
+      AND p.request::jsonb = s.request::jsonb
+      AND p.predictions::jsonb = s.predictions::jsonb
+);
+"""
+
+
+def list_log_files(log_file):
+    """
+    Archivos de logs en orden cronológico: los rotados por la API (predictions.log.AAAAMMDDHH[.n]) y el actual.
+    """
+    rotated = []
+    for path in glob.glob(log_file + '.*'):
+        match = ROTATED_SUFFIX.match(path[len(log_file) + 1:])
+        if match:
+            # Orden numérico del sufijo: .10 va después de .2
+            rotated.append(((match.group(1), int(match.group(2) or 0)), path))
+    log_files = [path for _, path in sorted(rotated)]
+    if os.path.exists(log_file):
+        log_files.append(log_file)
+    return log_files
+
+
+def file_head(path):
+    """
+    Hash de la primera línea completa del archivo; `None` si todavía no tiene ninguna.
+    """
+    with open(path, 'rb') as f:
+        line = f.readline()
+    if not line.endswith(b'\n'):
+        return None
+    return hashlib.sha256(line).hexdigest()[:16]
+
+
+def read_new_lines(path, offset):
+    """
+    Lee el archivo desde `offset` línea por línea. Produce `(registro, offset al final de la línea)`;
+    una última línea sin salto de línea (todavía se está escribiendo) se deja para la siguiente corrida.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                log = json.loads(line)
+                if not isinstance(log, dict) or not LOG_FIELDS.issubset(log):
+                    raise ValueError
+            except ValueError:
+                # Una línea inválida no debe bloquear las siguientes corridas
+                print(f"Advertencia: línea inválida en {path} (offset {offset - len(line)}), se omite.")
+                log = None
+            yield log, offset
+
 
 @transformer
 def etl_logs(*args, **kwargs):
     """
-    ETL para guardar logs de predicciones en la base de datos.
+    ETL incremental de los logs de predicciones a la base de datos.
+
+    Solo lee las líneas nuevas desde el último checkpoint (inodo + primera línea + offset) de cada
+    archivo, las carga con COPY y guarda los checkpoints en la misma transacción: si la corrida falla
+    no queda nada a medias y la siguiente corrida vuelve a empezar desde el mismo punto.
+
+    Si todavía no hay checkpoints pero `prediction_logs` ya tiene filas (cargadas por la versión
+    anterior de este bloque, que leía todos los archivos en cada corrida), se omiten las líneas que ya
+    están en la tabla en lugar de volver a insertar todo el historial.
     """
+    # Leer los logs de predicciones
+    logs_dir = os.path.join('logs', 'api')
+    log_file = os.path.join(logs_dir, 'predictions.log')
+
+    log_files = list_log_files(log_file)
+    if not log_files:
+        print(f"No se encontró el archivo de logs en {log_file}.")
+        return
+
     try:
-        # Conectar a la base de datos
-        print(f"Conectando a la base de datos en {DB_CONFIG['host']}:{DB_CONFIG['port']}...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # Leer los logs de predicciones
-        logs_dir = os.path.join('logs', 'api')
-        log_file = os.path.join(logs_dir, 'predictions.log')
-
-        if not os.path.exists(log_file):
-            print(f"No se encontró el archivo de logs en {log_file}.")
-            return
-
-        with open(log_file, 'r') as f:
-            logs = [json.loads(line) for line in f.readlines()]
-
-        # Insertar cada log en la base de datos
-        for log in logs:
-            cursor.execute(
-                """
-                INSERT INTO prediction_logs (timestamp, request, predictions)
-                VALUES (%s, %s, %s)
-                """,
-                (log['timestamp'], json.dumps(log['request']), json.dumps(log['predictions']))
-            )
-
-        # Confirmar cambios
-        conn.commit()
-        print("Logs de predicción insertados en la base de datos con éxito.")
+        # La conexión confirma la transacción al salir del bloque (filas y checkpoints juntos)
+        with connection() as conn, conn.cursor() as cursor:
+            cursor.execute(CHECKPOINT_TABLE_SQL)
+            # Evitar que dos corridas simultáneas carguen las mismas líneas
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('etl_logs'))")
+            cursor.execute('SELECT inode, head, "offset" FROM etl_log_checkpoints')
+            checkpoints = {inode: (head, offset) for inode, head, offset in cursor.fetchall()}
+
+            target = 'prediction_logs'
+            if not checkpoints:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM prediction_logs)")
+                if cursor.fetchone()[0]:
+                    print("Primera carga incremental con filas ya cargadas: se omiten las líneas repetidas.")
+                    cursor.execute(STAGING_TABLE_SQL)
+                    target = 'etl_logs_staging'
+
+            started = time.perf_counter()
+            inserted = 0
+            bytes_read = 0
+            for path in log_files:
+                stat = os.stat(path)
+                head = file_head(path)
+                if head is None:
+                    continue
+                stored_head, offset = checkpoints.get(stat.st_ino, (None, 0))
+                if (stored_head is not None and stored_head != head) or offset > stat.st_size:
+                    # Otro archivo con el mismo inodo (un checkpoint anterior sin `head` se acepta si cabe en el archivo)
+                    offset = 0
+                if offset == stat.st_size and stored_head == head:
+                    continue
+
+                # `position` termina con el offset de la última línea completa leída
+                position = [offset]
+
+                def rows():
+                    for log, end in read_new_lines(path, offset):
+                        position[0] = end
+                        if log is not None:
+                            yield log['timestamp'], json.dumps(log['request']), json.dumps(log['predictions'])
+
+                inserted += copy_rows(cursor, target, ('timestamp', 'request', 'predictions'), rows())
+                bytes_read += position[0] - offset
+                cursor.execute(
+                    """
+                    INSERT INTO etl_log_checkpoints (inode, path, head, "offset", updated_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (inode) DO UPDATE
+                    SET path = EXCLUDED.path, head = EXCLUDED.head, "offset" = EXCLUDED."offset",
+                        updated_at = EXCLUDED.updated_at
+                    """,
+                    (stat.st_ino, path, head, position[0], datetime.now())
+                )
+
+            if target == 'etl_logs_staging':
+                staged = inserted
+                cursor.execute(INSERT_STAGED_SQL)
+                inserted = cursor.rowcount
+                print(f"Se omitieron {staged - inserted} líneas que ya estaban en `prediction_logs`.")
+
+            # Olvidar los checkpoints de archivos que ya no existen
+            current_inodes = [os.stat(path).st_ino for path in log_files]
+            cursor.execute('DELETE FROM etl_log_checkpoints WHERE NOT (inode = ANY(%s))', (current_inodes,))
+
+        elapsed = time.perf_counter() - started
+        rate = inserted / elapsed if elapsed > 0 else 0.0
+        print(
+            f"Logs de predicción insertados en la base de datos con éxito: {inserted} filas nuevas "
+            f"({bytes_read / 1024:.1f} KB leídos) en {elapsed:.2f}s ({rate:.0f} filas/s)."
+        )
 
     except Exception as e:
         print(f"Error en el ETL de logs: {e}")
+        raise e
 
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 @test
 def test_etl_logs(*args, **kwargs):
@@ -67,21 +206,19 @@ def test_etl_logs(*args, **kwargs):
     Prueba para validar la inserción de logs en la base de datos.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
+        with connection() as conn, conn.cursor() as cursor:
+            # Verificar que hay al menos un registro en la tabla
+            cursor.execute("SELECT COUNT(*) FROM prediction_logs")
+            count = cursor.fetchone()[0]
+            assert count > 0, "No se encontraron registros en la tabla prediction_logs."
 
-        # Verificar que hay al menos un registro en la tabla
-        cursor.execute("SELECT COUNT(*) FROM prediction_logs")
-        count = cursor.fetchone()[0]
-        assert count > 0, "No se encontraron registros en la tabla prediction_logs."
+            # Ningún checkpoint puede apuntar más allá del final de su archivo
+            cursor.execute('SELECT path, "offset" FROM etl_log_checkpoints')
+            for path, offset in cursor.fetchall():
+                if os.path.exists(path):
+                    assert offset <= os.path.getsize(path), f"El checkpoint de {path} supera el tamaño del archivo."
 
-        print(f"Prueba pasada: Se encontraron {count} registros en la tabla prediction_logs.")
+            print(f"Prueba pasada: Se encontraron {count} registros en la tabla prediction_logs.")
 
     except Exception as e:
         print(f"Error durante la prueba de ETL logs: {e}")
-
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
\ No newline at end of file
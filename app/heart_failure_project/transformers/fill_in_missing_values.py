@@ -1,5 +1,6 @@
 from pandas import DataFrame
-import math
+
+from heart_failure_project.utils.imputation import ColumnImputer
 
 if 'transformer' not in globals():
     from mage_ai.data_preparation.decorators import transformer
@@ -10,12 +11,15 @@ def select_number_columns(df: DataFrame) -> DataFrame:
     return df[['Age', 'Fare', 'Parch', 'Pclass', 'SibSp', 'Survived']]
 
 
-def fill_missing_values_with_median(df: DataFrame) -> DataFrame:
-    for col in df.columns:
-        values = sorted(df[col].dropna().tolist())
-        median_value = values[math.floor(len(values) / 2)]
-        df[[col]] = df[[col]].fillna(median_value)
-    return df
+def fill_missing_values_with_median(df: DataFrame, stats_path: str = None) -> DataFrame:
+    """
+    Completa los faltantes con la mediana exacta de cada columna, calculada en una sola pasada.
+    Si se indica `stats_path`, guarda las estadísticas para reutilizarlas sin recalcularlas.
+    """
+    imputer = ColumnImputer(strategy='median').fit(df)
+    if stats_path:
+        imputer.save(stats_path)
+    return imputer.transform(df)
 
 
 @transformer
@@ -34,7 +38,7 @@ def transform_df(df: DataFrame, *args, **kwargs) -> DataFrame:
     """
     # Specify your transformation logic here
 
-    return fill_missing_values_with_median(select_number_columns(df))
+    return fill_missing_values_with_median(select_number_columns(df), kwargs.get('imputation_stats_path'))
 
 
 @test
@@ -8,17 +8,65 @@ if 'test' not in globals():
 import pandas as pd
 import joblib
 import os
+from heart_failure_project.utils.batch_scoring import score_csv
+from heart_failure_project.utils.block_cache import cached_block
+
+
+def _batch(kwargs):
+    return kwargs.get('predict_mode', os.getenv('PREDICT_MODE', 'default')).lower() == 'batch'
+
+
+def predict_batch(model_path, **kwargs):
+    """
+    Predice un archivo grande por bloques en un pool de procesos y escribe la salida en Parquet
+    particionado (ver `score_csv`). Una corrida interrumpida continúa desde los bloques que faltan.
+    """
+    input_path = kwargs.get('input_path', os.getenv('PREDICT_INPUT', 'data/test_data.csv'))
+    output_dir = kwargs.get('output_dir', os.getenv('PREDICT_OUTPUT_DIR', 'data/predictions'))
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"No se encontró el archivo a predecir en {input_path}.")
+
+    print(f"Prediciendo {input_path} por bloques en {output_dir}...")
+    report = score_csv(
+        input_path,
+        output_dir,
+        model_path,
+        chunksize=int(kwargs.get('chunksize', os.getenv('PREDICT_CHUNKSIZE', '100000'))),
+        workers=int(os.getenv('PREDICT_WORKERS', '0')) or None,
+        resume=os.getenv('PREDICT_RESUME', '1').lower() in ('1', 'true', 'yes'),
+    )
+    print(
+        f"Predicciones generadas: {report['rows']} filas en {report['chunks']} bloques "
+        f"({report['skipped_chunks']} ya terminados) en {report['elapsed_s']:.2f}s con {report['workers']} procesos "
+        f"({report['rows_per_s']:.0f} filas/s; {report['scored_s']:.2f}s de predicción)."
+    )
+    return report
 
 
 @transformer
+@cached_block(
+    input_files=['data/test_data.csv', 'models/trained_model.joblib'],
+    output_files=['data/predictions.csv'],
+    # El modo por lotes ya reanuda por su cuenta y su entrada puede ser enorme para calcular la llave
+    bypass=_batch,
+)
 def predict_model(*args, **kwargs):
     """
     Realiza predicciones utilizando el modelo entrenado y los datos de prueba guardados,
     y guarda los resultados en un archivo CSV.
 
+    Con `predict_mode='batch'` (variable del pipeline o PREDICT_MODE) predice PREDICT_INPUT por
+    bloques en un pool de procesos y guarda predicciones y probabilidades en Parquet (`predict_batch`).
+
     Args:
         No requiere argumentos, ya que los datos de prueba y el modelo se cargan desde disco.
     """
+    if _batch(kwargs):
+        model_path = 'models/trained_model.joblib'
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No se encontró el modelo entrenado en {model_path}. Por favor, entrena el modelo primero.")
+        return predict_batch(model_path, **kwargs)
+
     # Cargar los datos de prueba
     test_data_path = 'data/test_data.csv'
     if not os.path.exists(test_data_path):
@@ -73,10 +121,16 @@ def predict_model(*args, **kwargs):
 
 
 @test
-def test_output(*args, **kwargs) -> None:
+def test_output(output=None, *args, **kwargs) -> None:
     """
     Validar que las predicciones se guardaron correctamente.
     """
+    if isinstance(output, dict) and 'output_dir' in output:
+        parts = [name for name in os.listdir(output['output_dir']) if name.endswith('.parquet')]
+        assert parts, f"No se generaron archivos de predicciones en {output['output_dir']}."
+        print(f"Prueba pasada: {len(parts)} archivos de predicciones en {output['output_dir']}.")
+        return
+
     output_path = 'data/predictions.csv'
     assert os.path.exists(output_path), f"No se generó el archivo de predicciones en {output_path}."
     predictions = pd.read_csv(output_path)
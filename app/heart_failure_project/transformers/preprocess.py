@@ -4,8 +4,12 @@ if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
 import pandas as pd
+from heart_failure_project.utils import encoding
+from heart_failure_project.utils.block_cache import cached_block
+from heart_failure_project.utils.encoding import CATEGORICAL_MAPPINGS
 
 @transformer
+@cached_block(output_files=['data/processed_data.csv'], modules=[encoding])
 def transform(data, *args, **kwargs):
     """
     Limpia y transforma los datos cargados en el bloque anterior.
@@ -19,18 +23,20 @@ def transform(data, *args, **kwargs):
     # Limpieza y transformación
     print("Limpieza y transformación de datos...")
     
-    # Ejemplo de transformación de columnas categóricas
-    data['Sex'] = data['Sex'].map({'M': 1, 'F': 0})
-    data['ExerciseAngina'] = data['ExerciseAngina'].map({'Y': 1, 'N': 0})
-    data['ChestPainType'] = data['ChestPainType'].map({'ATA': 0, 'NAP': 1, 'ASY': 2, 'TA': 3})
-    data['RestingECG'] = data['RestingECG'].map({'Normal': 0, 'ST': 1, 'LVH': 2})
-    data['ST_Slope'] = data['ST_Slope'].map({'Up': 0, 'Flat': 1, 'Down': 2})
+    # Transformación de columnas categóricas (la misma codificación que usa main.py al servir)
+    for column, mapping in CATEGORICAL_MAPPINGS.items():
+        data[column] = data[column].map(mapping)
 
     # Validaciones para verificar que no existan valores nulos
     print("Validando datos...")
     if data.isnull().sum().any():
         raise ValueError("Existen valores nulos en los datos después de la transformación.")
 
+    # Con el esquema de `load_data` las columnas categóricas son `category` y `map` devuelve otra categoría
+    for column in CATEGORICAL_MAPPINGS:
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].astype('int8')
+
     # Guardar los datos procesados en un archivo CSV
     processed_csv_path = 'data/processed_data.csv'
     print(f"Guardando datos procesados en {processed_csv_path}...")
@@ -0,0 +1,103 @@
+from heart_failure_project.utils.db import connection
+from heart_failure_project.utils.prediction_logs import LABELLED_LOGS_SQL, committed_log_id
+
+# Importar los decoradores si no están ya en el entorno global
+if 'transformer' not in globals():
+    from mage_ai.data_preparation.decorators import transformer
+if 'test' not in globals():
+    from mage_ai.data_preparation.decorators import test
+
+# Tabla precalculada para el dashboard de Shiny e índices para sus consultas sobre las tablas crudas.
+# `sum_epoch` permite calcular el promedio de NOW() - timestamp sin volver a leer los logs:
+# AVG(NOW() - timestamp) = NOW() - SUM(epoch) / COUNT(*).
+# La tabla por hora de versiones anteriores no la leía el dashboard: se elimina.
+ROLLUP_TABLES_SQL = """
+DROP TABLE IF EXISTS prediction_rollup_hourly;
+CREATE TABLE IF NOT EXISTS prediction_rollup_daily (
+    bucket DATE PRIMARY KEY,
+    requests BIGINT NOT NULL,
+    sum_epoch DOUBLE PRECISION NOT NULL,
+    tp BIGINT NOT NULL,
+    fp BIGINT NOT NULL,
+    tn BIGINT NOT NULL,
+    fn BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_log_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+INSERT INTO rollup_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+CREATE INDEX IF NOT EXISTS prediction_logs_timestamp_idx ON prediction_logs (timestamp);
+CREATE INDEX IF NOT EXISTS evaluations_timestamp_idx ON evaluations (timestamp);
+"""
+
+# Agrega por día los logs nuevos (etiqueta real del primer registro contra la primera predicción)
+DAILY_DELTA_SQL = """
+INSERT INTO prediction_rollup_daily (bucket, requests, sum_epoch, tp, fp, tn, fn)
+WITH""" + LABELLED_LOGS_SQL + """
+SELECT
+    timestamp::date AS bucket,
+    COUNT(*) AS requests,
+    SUM(EXTRACT(EPOCH FROM timestamp)) AS sum_epoch,
+    COUNT(*) FILTER (WHERE is_positive AND predicted_positive) AS tp,
+    COUNT(*) FILTER (WHERE NOT is_positive AND predicted_positive) AS fp,
+    COUNT(*) FILTER (WHERE NOT is_positive AND NOT predicted_positive) AS tn,
+    COUNT(*) FILTER (WHERE is_positive AND NOT predicted_positive) AS fn
+FROM labelled_logs
+GROUP BY 1
+ON CONFLICT (bucket) DO UPDATE SET
+    requests = prediction_rollup_daily.requests + EXCLUDED.requests,
+    sum_epoch = prediction_rollup_daily.sum_epoch + EXCLUDED.sum_epoch,
+    tp = prediction_rollup_daily.tp + EXCLUDED.tp,
+    fp = prediction_rollup_daily.fp + EXCLUDED.fp,
+    tn = prediction_rollup_daily.tn + EXCLUDED.tn,
+    fn = prediction_rollup_daily.fn + EXCLUDED.fn;
+"""
+
+
+@transformer
+def transform(data, *args, **kwargs):
+    """
+    Actualiza la tabla por día que lee el dashboard, sumando solo los logs de `prediction_logs`
+    posteriores a la última corrida.
+    """
+    try:
+        # Hasta dónde se puede sumar sin saltear logs que todavía no se confirmaron
+        max_log_id = committed_log_id()
+
+        # La conexión confirma la transacción al salir del bloque (tabla y marca de agua juntas)
+        with connection() as conn, conn.cursor() as cursor:
+            cursor.execute(ROLLUP_TABLES_SQL)
+            cursor.execute("SELECT last_log_id FROM rollup_state WHERE id = 1 FOR UPDATE;")
+            last_log_id = cursor.fetchone()[0]
+
+            cursor.execute(DAILY_DELTA_SQL, {"last_log_id": last_log_id, "max_log_id": max_log_id})
+            days = cursor.rowcount
+            cursor.execute(
+                "UPDATE rollup_state SET last_log_id = %s, updated_at = NOW() WHERE id = 1;",
+                (max(last_log_id, max_log_id),)
+            )
+
+        print(f"Tabla del dashboard actualizada: logs hasta el id {max(last_log_id, max_log_id)} en {days} días.")
+
+    except Exception as e:
+        print(f"Error al actualizar las tablas del dashboard: {e}")
+        raise e
+
+@test
+def test_output(*args, **kwargs) -> None:
+    """
+    Prueba para validar que la tabla por día cuadra con los logs ya procesados.
+    """
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT last_log_id FROM rollup_state WHERE id = 1;")
+        last_log_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM prediction_logs WHERE id <= %s;", (last_log_id,))
+        expected = cursor.fetchone()[0]
+
+        cursor.execute("SELECT COALESCE(SUM(requests), 0) FROM prediction_rollup_daily;")
+        daily = cursor.fetchone()[0]
+
+        assert daily == expected, f"La tabla no cuadra: {daily} por día, {expected} logs."
+        print(f"Prueba pasada: {expected} registros resumidos en la tabla del dashboard.")
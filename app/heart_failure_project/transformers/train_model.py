@@ -10,16 +10,171 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import joblib
+import json
 import os
+import time
+from heart_failure_project.utils import compaction, compiled_forest, forest_artifact, training
+from heart_failure_project.utils.block_cache import cached_block
+from heart_failure_project.utils.compaction import compact_forest, compaction_settings_from_env, print_compaction_report
+from heart_failure_project.utils.compiled_forest import CompiledForest
+from heart_failure_project.utils.db import connection, stream_query
+from heart_failure_project.utils.forest_artifact import file_version, save_forest_artifact, save_model
+from heart_failure_project.utils.prediction_logs import committed_log_id
+from heart_failure_project.utils.training import (
+    add_trees,
+    cross_validate_grid,
+    labelled_frame,
+    param_grid_from_env,
+    print_cv_report,
+)
+
+# Último id de `prediction_logs` ya usado por el entrenamiento incremental
+TRAINING_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS training_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_log_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+INSERT INTO training_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+"""
+
+# Cada registro de las solicitudes nuevas que trae la etiqueta real (una solicitud puede traer varios)
+NEW_LABELLED_SQL = """
+SELECT record
+FROM prediction_logs,
+     LATERAL jsonb_array_elements(
+         CASE WHEN jsonb_typeof(request::jsonb) = 'array' THEN request::jsonb ELSE jsonb_build_array(request::jsonb) END
+     ) AS record
+WHERE id > %(last_log_id)s AND id <= %(max_log_id)s
+  AND jsonb_typeof(record) = 'object' AND record ? 'HeartDisease';
+"""
+
+
+def train_incremental(model_path, artifact_path, test_data_path, target_column, **kwargs):
+    """
+    Agrega árboles al modelo actual entrenados solo con los registros etiquetados que llegaron a
+    `prediction_logs` desde la última corrida, y lo promueve si su precisión sobre los datos de prueba
+    no cae más de TRAINING_PROMOTE_TOLERANCE respecto del modelo actual. La precisión se mide con el
+    motor compilado que sirve la API (en la precisión del artefacto, float32 si lo eligió la compactación).
+    """
+    new_trees = int(kwargs.get('incremental_trees', os.getenv('TRAINING_INCREMENTAL_TREES', '20')))
+    max_trees = int(kwargs.get('max_trees', os.getenv('TRAINING_MAX_TREES', '300')))
+    min_rows = int(os.getenv('TRAINING_INCREMENTAL_MIN_ROWS', '50'))
+    tolerance = float(os.getenv('TRAINING_PROMOTE_TOLERANCE', '0.01'))
+
+    model = joblib.load(model_path)
+    features = list(model.feature_names_in_)
+    test_data = pd.read_csv(test_data_path)
+    X_test = test_data[features].to_numpy()
+    current_accuracy = accuracy_score(test_data[target_column], CompiledForest.from_sklearn(model).predict(X_test))
+
+    result = {
+        "status": "success",
+        "training_mode": "incremental",
+        "model_path": model_path,
+        "artifact_path": artifact_path,
+        "test_data_path": test_data_path,
+        "previous_accuracy": current_accuracy,
+        "accuracy": current_accuracy,
+        "promoted": False,
+        "new_rows": 0,
+    }
+
+    # Hasta dónde se pueden leer logs sin saltear los que todavía no se confirmaron
+    max_log_id = committed_log_id()
+
+    # La conexión confirma la transacción al salir del bloque (la marca de agua avanza solo si todo salió bien)
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(TRAINING_STATE_SQL)
+            cursor.execute("SELECT last_log_id FROM training_state WHERE id = 1 FOR UPDATE;")
+            last_log_id = cursor.fetchone()[0]
+        max_log_id = max(last_log_id, max_log_id)
+
+        started = time.perf_counter()
+        records = [
+            row[0] for row in stream_query(conn, NEW_LABELLED_SQL, {"last_log_id": last_log_id, "max_log_id": max_log_id})
+        ]
+        X_new, y_new, skipped = labelled_frame(records, features, target_column)
+        result["new_rows"] = len(X_new)
+        print(
+            f"Se encontraron {len(X_new)} registros etiquetados nuevos en {max_log_id - last_log_id} logs "
+            f"de `prediction_logs` ({skipped} omitidos) en {time.perf_counter() - started:.2f}s."
+        )
+
+        if len(X_new) < min_rows or y_new.nunique() < 2:
+            # Sin suficientes datos nuevos la marca de agua no avanza: se acumulan para la próxima corrida
+            print(f"Se necesitan al menos {min_rows} registros nuevos de ambas clases; el modelo actual se mantiene.")
+            conn.rollback()
+            return result
+
+        started = time.perf_counter()
+        trees = add_trees(model, X_new, y_new, new_trees, max_trees)
+        fit_s = time.perf_counter() - started
+        accuracy = accuracy_score(test_data[target_column], CompiledForest.from_sklearn(model).predict(X_test))
+        result.update(trees, accuracy=accuracy, fit_s=fit_s)
+        print(
+            f"Árboles: {trees['trees_before']} + {trees['trees_added']} nuevos - {trees['trees_retired']} retirados "
+            f"= {trees['trees_after']} (ajuste en {fit_s:.2f}s)."
+        )
+        print(f"Precisión sobre {test_data_path}: actual {current_accuracy:.4f}, candidato {accuracy:.4f}.")
+
+        if accuracy + tolerance >= current_accuracy:
+            print(f"Promoviendo el modelo: guardando en {model_path} y {artifact_path}...")
+            save_model(model, model_path)
+            save_forest_artifact(model, artifact_path, version=file_version(model_path))
+            result["promoted"] = True
+        else:
+            print("El candidato pierde precisión; el modelo actual se mantiene y se descartan los registros nuevos.")
+
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE training_state SET last_log_id = %s, updated_at = NOW() WHERE id = 1;",
+                (max_log_id,)
+            )
+    return result
+
+
+def _incremental(kwargs):
+    return kwargs.get('training_mode', os.getenv('TRAINING_MODE', 'single')).lower() == 'incremental'
 
 
 @transformer
+@cached_block(
+    output_files=[
+        'models/trained_model.joblib',
+        'models/compiled_model',
+        'data/test_data.csv',
+        'models/training_report.json',
+        'models/compaction_report.json',
+    ],
+    params=['training_mode', 'param_grid', 'cv_folds', 'compaction'],
+    env=[
+        'TRAINING_MODE', 'TRAINING_GRID', 'TRAINING_CV_FOLDS', 'TRAINING_COMPACTION',
+        'COMPACTION_TOLERANCE', 'COMPACTION_LATENCY_MS', 'COMPACTION_DEPTHS', 'COMPACTION_TREES',
+    ],
+    modules=[compaction, compiled_forest, forest_artifact, training],
+    # El modo incremental lee `prediction_logs`, que no entra en la llave
+    bypass=_incremental,
+)
 def train_model(preprocessed_data: pd.DataFrame, *args, **kwargs):
     """
     Entrena un modelo Random Forest con los datos procesados y devuelve el DataFrame original junto con metadatos del modelo.
 
     Args:
         preprocessed_data: DataFrame procesado (salida del bloque `preprocess`).
+
+    Con `training_mode='cv'` (variable del pipeline o TRAINING_MODE) primero busca la mejor configuración
+    de la grilla (TRAINING_GRID en JSON) con validación cruzada de TRAINING_CV_FOLDS pliegues sobre el
+    conjunto de entrenamiento, en TRAINING_WORKERS procesos, y entrena el modelo final con ella.
+    Con `training_mode='incremental'` no vuelve a entrenar con todos los datos: agrega árboles al modelo
+    actual con los registros etiquetados nuevos de `prediction_logs` (ver `train_incremental`).
+    Por defecto (`single`) entrena una sola vez con los parámetros de siempre.
+
+    Con `compaction=True` (o TRAINING_COMPACTION=1), después de entrenar busca el modelo más chico
+    (menos árboles, menor profundidad, umbrales y hojas en float32) que no pierda más de
+    COMPACTION_TOLERANCE de precisión sobre los datos de prueba y cumpla COMPACTION_LATENCY_MS por fila
+    (ver `compact_forest`), y guarda ese en lugar del original junto con models/compaction_report.json.
     """
     # Validar entrada
     if not isinstance(preprocessed_data, pd.DataFrame):
@@ -34,6 +189,20 @@ def train_model(preprocessed_data: pd.DataFrame, *args, **kwargs):
     if target_column not in preprocessed_data.columns:
         raise ValueError(f"La columna objetivo '{target_column}' no está presente en los datos.")
 
+    model_path = 'models/trained_model.joblib'
+    artifact_path = 'models/compiled_model'
+    test_data_path = 'data/test_data.csv'
+
+    training_mode = kwargs.get('training_mode', os.getenv('TRAINING_MODE', 'single')).lower()
+    if training_mode not in ('single', 'cv', 'incremental'):
+        raise ValueError(f"Modo de entrenamiento no soportado: '{training_mode}'. Use 'single', 'cv' o 'incremental'.")
+
+    if training_mode == 'incremental':
+        if os.path.exists(model_path) and os.path.exists(test_data_path):
+            return {"data": preprocessed_data, **train_incremental(model_path, artifact_path, test_data_path, target_column, **kwargs)}
+        print("No hay un modelo o datos de prueba previos; se entrena el modelo completo.")
+        training_mode = 'single'
+
     # Separar características (X) y etiqueta (y)
     X = preprocessed_data.drop(columns=[target_column])
     y = preprocessed_data[target_column]
@@ -43,9 +212,30 @@ def train_model(preprocessed_data: pd.DataFrame, *args, **kwargs):
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
+    # Buscar la mejor configuración con validación cruzada (solo sobre el conjunto de entrenamiento)
+    params = {}
+    cv_report = None
+    report_path = None
+    if training_mode == 'cv':
+        cv_report = cross_validate_grid(
+            X_train,
+            y_train,
+            param_grid=kwargs.get('param_grid') or param_grid_from_env(),
+            n_splits=int(kwargs.get('cv_folds', os.getenv('TRAINING_CV_FOLDS', '5'))),
+            workers=int(os.getenv('TRAINING_WORKERS', '0')) or None,
+        )
+        print_cv_report(cv_report)
+        params = cv_report['best_params']
+
+        report_path = 'models/training_report.json'
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(cv_report, f, indent=2)
+        print(f"Reporte de tiempos por configuración guardado en {report_path}.")
+
     # Entrenar el modelo
     print("Entrenando el modelo Random Forest...")
-    model = RandomForestClassifier(random_state=42)
+    model = RandomForestClassifier(random_state=42, **params)
     model.fit(X_train, y_train)
 
     # Evaluar el modelo
@@ -54,18 +244,37 @@ def train_model(preprocessed_data: pd.DataFrame, *args, **kwargs):
     accuracy = accuracy_score(y_test, y_pred)
     print(f"Precisión del modelo: {accuracy:.2f}")
 
+    # Compactar el modelo: el más chico dentro de la tolerancia de precisión y la latencia objetivo
+    compaction_report = None
+    compaction_report_path = None
+    if str(kwargs.get('compaction', os.getenv('TRAINING_COMPACTION', '0'))).lower() in ('1', 'true', 'yes'):
+        print("Buscando una versión compacta del modelo...")
+        compacted = compact_forest(model, X_train, y_train, X_test, y_test, params=params, **compaction_settings_from_env())
+        compaction_report = compacted['report']
+        print_compaction_report(compaction_report)
+        model = compacted['model']
+        accuracy = compaction_report['after']['accuracy']
+
+        compaction_report_path = 'models/compaction_report.json'
+        os.makedirs(os.path.dirname(compaction_report_path), exist_ok=True)
+        with open(compaction_report_path, 'w') as f:
+            json.dump(compaction_report, f, indent=2)
+        print(f"Reporte de compactación guardado en {compaction_report_path}.")
+
     # Guardar el modelo en disco
-    model_path = 'models/trained_model.joblib'
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
     print(f"Guardando el modelo en {model_path}...")
-    joblib.dump(model, model_path)
+    save_model(model, model_path)
+
+    # Exportar también el artefacto compacto (arreglos .npy + metadata.json) que la API puede mapear en memoria
+    print(f"Exportando el artefacto compacto en {artifact_path}...")
+    save_forest_artifact(model, artifact_path, version=file_version(model_path))
 
     print("Entrenamiento completado con éxito. Modelo guardado.")
 
     # Guardar los datos de prueba para futuras evaluaciones
     test_data = X_test.copy()
     test_data[target_column] = y_test
-    test_data_path = 'data/test_data.csv'
     os.makedirs(os.path.dirname(test_data_path), exist_ok=True)
     test_data.to_csv(test_data_path, index=False)
     print(f"Datos de prueba guardados en {test_data_path}.")
@@ -76,7 +285,14 @@ def train_model(preprocessed_data: pd.DataFrame, *args, **kwargs):
         "status": "success",
         "accuracy": accuracy,
         "model_path": model_path,
+        "artifact_path": artifact_path,
         "test_data_path": test_data_path,
+        "training_mode": training_mode,
+        "params": params,
+        "cv_report": cv_report,
+        "report_path": report_path,
+        "compaction_report": compaction_report,
+        "compaction_report_path": compaction_report_path,
     }
 
 
@@ -87,7 +303,10 @@ def test_output(output, *args, **kwargs) -> None:
     """
     assert output is not None, "El bloque `train_model` no devolvió ningún output."
     assert 'model_path' in output, "No se encontró la ruta del modelo en la salida del bloque."
-    assert os.path.exists(output['model_path']), f"El modelo no se guardó correctamente en {output['model_path']}."
+    # El modo incremental no escribe nada si el candidato no se promueve: se conservan el modelo y el artefacto anteriores
+    if output.get('training_mode') != 'incremental' or output.get('promoted'):
+        assert os.path.exists(output['model_path']), f"El modelo no se guardó correctamente en {output['model_path']}."
+        assert os.path.exists(os.path.join(output['artifact_path'], 'metadata.json')), f"El artefacto compacto no se exportó en {output['artifact_path']}."
     assert 'test_data_path' in output, "No se encontró la ruta de los datos de prueba en la salida del bloque."
     assert os.path.exists(output['test_data_path']), f"Los datos de prueba no se guardaron correctamente en {output['test_data_path']}."
     print("Prueba pasada: El modelo y los datos de prueba se guardaron correctamente.")
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Predicción por lotes para archivos grandes (backfills).
+
+El CSV de entrada se lee por bloques de `chunksize` filas y cada bloque se predice en un pool de
+procesos: cada worker carga el modelo una sola vez al iniciar. Cada bloque terminado se escribe
+como `part-NNNNNN.parquet` (con las predicciones y las probabilidades de cada clase) en el
+directorio de salida, primero en un archivo temporal que luego se renombra, así que un archivo
+existente siempre está completo. Si la corrida se interrumpe, la siguiente con la misma entrada
+y el mismo `chunksize` salta los bloques que ya tienen su archivo.
+"""
+import glob
+import io
+import itertools
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import pandas as pd
+
+from heart_failure_project.utils.forest_artifact import file_version
+from heart_failure_project.utils.training import process_pool_context
+
+# pyarrow es opcional para el resto del pipeline, pero la salida de este modo es Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+MANIFEST_FILE = "_manifest.json"
+PART_PATTERN = re.compile(r"part-(\d+)\.parquet$")
+
+# Modelo de cada worker del pool (se carga una sola vez, al crear el proceso)
+_worker_model = {}
+
+
+def _init_worker(model_path: str):
+    model = joblib.load(model_path)
+    # Un solo hilo por worker: el paralelismo lo da el pool
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    _worker_model["model"] = model
+
+
+def _part_path(output_dir: str, index: int) -> str:
+    return os.path.join(output_dir, f"part-{index:06d}.parquet")
+
+
+def _score_chunk(index: int, chunk: pd.DataFrame, output_dir: str, target_column: str) -> dict:
+    started = time.perf_counter()
+    model = _worker_model["model"]
+    features = list(model.feature_names_in_)
+    missing = set(features) - set(chunk.columns)
+    if missing:
+        raise ValueError(f"Faltan las siguientes columnas necesarias para el modelo: {missing}")
+
+    probabilities = model.predict_proba(chunk[features])
+    result = chunk[features + ([target_column] if target_column in chunk.columns else [])].copy()
+    result["Predictions"] = model.classes_[probabilities.argmax(axis=1)]
+    for i, label in enumerate(model.classes_):
+        result[f"Probability_{label}"] = probabilities[:, i]
+    scored_s = time.perf_counter() - started
+
+    # El temporal empieza con "_" para que los lectores de Parquet lo ignoren si la corrida se corta
+    path = _part_path(output_dir, index)
+    tmp_path = os.path.join(output_dir, f"_{os.path.basename(path)}.tmp")
+    pq.write_table(pa.Table.from_pandas(result, preserve_index=False), tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return {"index": index, "rows": len(result), "scored_s": scored_s, "total_s": time.perf_counter() - started}
+
+
+def _finished_parts(output_dir: str) -> set:
+    return {
+        int(match.group(1))
+        for match in (PART_PATTERN.search(os.path.basename(path)) for path in glob.glob(os.path.join(output_dir, "part-*.parquet")))
+        if match
+    }
+
+
+def _check_manifest(output_dir: str, manifest: dict, resume: bool):
+    """
+    Solo se reanuda con la misma entrada, el mismo modelo y el mismo tamaño de bloque: si no, los
+    números de bloque no corresponden a las mismas filas o las predicciones quedarían mezcladas.
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(path) and resume:
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError(
+                f"La salida en {output_dir} corresponde a otra entrada, otro modelo o otro tamaño de bloque "
+                f"({previous}); use otro directorio o `resume=False`."
+            )
+        for tmp_path in glob.glob(os.path.join(output_dir, "_part-*.tmp")):
+            os.remove(tmp_path)
+        return
+    for part in glob.glob(os.path.join(output_dir, "part-*.parquet")) + glob.glob(os.path.join(output_dir, "_part-*.tmp")):
+        os.remove(part)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _collect(done, report: dict):
+    for future in done:
+        result = future.result()
+        report["rows"] += result["rows"]
+        report["chunks"] += 1
+        report["scored_s"] += result["scored_s"]
+
+
+def score_csv(
+    input_path: str,
+    output_dir: str,
+    model_path: str,
+    chunksize: int = 100_000,
+    workers: int = None,
+    target_column: str = "HeartDisease",
+    resume: bool = True,
+) -> dict:
+    """
+    Predice todo `input_path` por bloques y devuelve un reporte de filas, bloques y filas por segundo.
+    """
+    if pa is None:
+        raise ImportError("pyarrow no está instalado; no se puede escribir la salida en Parquet.")
+    stat = os.stat(input_path)
+    manifest = {
+        "input_path": os.path.abspath(input_path),
+        "input_size": stat.st_size,
+        "input_mtime": stat.st_mtime,
+        "model_version": file_version(model_path),
+        "chunksize": chunksize,
+    }
+    _check_manifest(output_dir, manifest, resume)
+
+    finished = _finished_parts(output_dir)
+    # Los bloques terminados al principio se saltan leyendo líneas, sin separar sus campos
+    # (el CSV no tiene saltos de línea dentro de los campos)
+    prefix = 0
+    while prefix in finished:
+        prefix += 1
+
+    workers = workers or os.cpu_count() or 1
+    report = {"rows": 0, "chunks": 0, "skipped_chunks": len(finished), "scored_s": 0.0}
+    started = time.perf_counter()
+    with open(input_path, "rb") as f, ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=process_pool_context(),
+        initializer=_init_worker,
+        initargs=(model_path,),
+    ) as pool:
+        columns = list(pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns)
+        for _ in itertools.islice(f, prefix * chunksize):
+            pass
+
+        pending = set()
+        reader = pd.read_csv(f, names=columns, header=None, chunksize=chunksize)
+        for index, chunk in enumerate(reader, start=prefix):
+            if index in finished or chunk.empty:
+                continue
+            # Pocos bloques en vuelo: la memoria no crece con el tamaño del archivo
+            while len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done, report)
+            pending.add(pool.submit(_score_chunk, index, chunk, output_dir, target_column))
+        done, _ = wait(pending)
+        _collect(done, report)
+
+    report["elapsed_s"] = time.perf_counter() - started
+    report["rows_per_s"] = report["rows"] / report["elapsed_s"] if report["elapsed_s"] > 0 else 0.0
+    report["workers"] = workers
+    report["output_dir"] = output_dir
+    return report
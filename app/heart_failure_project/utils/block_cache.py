@@ -0,0 +1,271 @@
+"""
+Caché de salidas de los bloques del pipeline.
+
+La llave de cada corrida combina el código del bloque (y de los módulos que use), sus entradas,
+los parámetros y variables de entorno declarados y el contenido de los archivos que lee. Si la llave
+ya está en la caché, el bloque no se ejecuta: se devuelve la salida guardada (los DataFrames en
+Parquet, el resto con joblib) y se restauran los archivos que el bloque escribe (modelo, artefacto,
+CSV). Cada corrida deja una línea en `<BLOCK_CACHE_DIR>/cache_log.jsonl` con el acierto o fallo y
+el tiempo ahorrado.
+
+Se activa con BLOCK_CACHE=1; por defecto los bloques se ejecutan siempre.
+"""
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+import joblib
+import pandas as pd
+
+from heart_failure_project.utils.forest_artifact import publish_directory
+
+# pyarrow es opcional: sin él, los DataFrames se guardan con joblib
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+BLOCK_CACHE_DIR = os.path.join(".cache", "blocks")
+MANIFEST_FILE = "manifest.json"
+CACHE_LOG_FILE = "cache_log.jsonl"
+
+
+def _enabled() -> bool:
+    return os.getenv("BLOCK_CACHE", "0").lower() in ("1", "true", "yes")
+
+
+def _path_digest(path: str) -> str:
+    """
+    Digest del contenido de un archivo o de todos los archivos de un directorio; `None` si no existe.
+    """
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for file_path in sorted(glob.glob(os.path.join(path, "**", "*"), recursive=True)):
+            if os.path.isfile(file_path):
+                digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+                digest.update(_path_digest(file_path).encode("utf-8"))
+        return digest.hexdigest()
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_digest(obj) -> str:
+    """
+    Digest del código fuente del archivo donde está definido `obj` (función o módulo).
+    Mage ejecuta los bloques con `exec`, así que se lee el archivo en lugar de usar `inspect`.
+    """
+    code = getattr(obj, "__code__", None)
+    path = code.co_filename if code is not None else getattr(obj, "__file__", None)
+    if path and os.path.isfile(path):
+        return _path_digest(path)
+    return hashlib.sha256(inspect.getsource(obj).encode("utf-8")).hexdigest()
+
+
+def _value_digest(value) -> str:
+    """
+    Digest del contenido de una entrada del bloque. Los DataFrames se comparan por valores, columnas
+    y tipos (no por su pickle, que cambia según cómo se construyó el DataFrame, p. ej. CSV o Parquet).
+    """
+    if isinstance(value, pd.DataFrame):
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        digest.update(json.dumps([list(map(str, value.columns)), list(map(str, value.dtypes))]).encode("utf-8"))
+        return digest.hexdigest()
+    if isinstance(value, dict):
+        return joblib.hash({str(key): _value_digest(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return joblib.hash([_value_digest(item) for item in value])
+    return joblib.hash(value)
+
+
+def cache_key(function, args, params: dict, input_files, modules) -> str:
+    parts = {
+        "source": _source_digest(function),
+        "modules": {module.__name__: _source_digest(module) for module in modules},
+        "args": _value_digest(args),
+        "params": params,
+        "input_files": {path: _path_digest(path) for path in input_files},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:24]
+
+
+def _dump_value(value, directory: str) -> dict:
+    """
+    Guarda la salida del bloque: un DataFrame (o los DataFrames de un dict) en Parquet y el resto con joblib.
+    """
+    def dump_frame(df, name):
+        if pyarrow is not None:
+            df.to_parquet(os.path.join(directory, f"{name}.parquet"), index=True)
+            return f"{name}.parquet"
+        joblib.dump(df, os.path.join(directory, f"{name}.joblib"))
+        return f"{name}.joblib"
+
+    if isinstance(value, pd.DataFrame):
+        return {"kind": "frame", "file": dump_frame(value, "output")}
+    if isinstance(value, dict):
+        frames = {key: dump_frame(item, f"output_{i}") for i, (key, item) in enumerate(value.items()) if isinstance(item, pd.DataFrame)}
+        joblib.dump({key: item for key, item in value.items() if key not in frames}, os.path.join(directory, "output.joblib"))
+        return {"kind": "dict", "file": "output.joblib", "frames": frames, "order": list(value)}
+    joblib.dump(value, os.path.join(directory, "output.joblib"))
+    return {"kind": "object", "file": "output.joblib"}
+
+
+def _load_value(layout: dict, directory: str):
+    def load_frame(name):
+        path = os.path.join(directory, name)
+        return pd.read_parquet(path) if name.endswith(".parquet") else joblib.load(path)
+
+    if layout["kind"] == "frame":
+        return load_frame(layout["file"])
+    value = joblib.load(os.path.join(directory, layout["file"]))
+    if layout["kind"] == "dict":
+        value.update({key: load_frame(name) for key, name in layout["frames"].items()})
+        value = {key: value[key] for key in layout["order"]}
+    return value
+
+
+def _copy_path(source: str, target: str, publish: bool = False):
+    """
+    Copia un archivo o directorio reemplazando el destino por renombre (nunca queda a medias).
+    Con `publish`, un directorio se publica como lo hace `save_forest_artifact` (enlace a una versión),
+    para que quien lo esté leyendo, como la API, nunca lo encuentre ausente.
+    """
+    parent = os.path.dirname(target)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    tmp = f"{target}.tmp-{uuid.uuid4().hex[:8]}"
+    if os.path.isdir(source):
+        shutil.copytree(source, tmp)
+        if publish:
+            publish_directory(tmp, target)
+            return
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.rename(tmp, target)
+    else:
+        shutil.copy2(source, tmp)
+        os.replace(tmp, target)
+
+
+def _log_run(cache_dir: str, record: dict):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, CACHE_LOG_FILE), "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _evict(block_dir: str, keep: int):
+    entries = sorted(
+        (path for path in glob.glob(os.path.join(block_dir, "*")) if os.path.isfile(os.path.join(path, MANIFEST_FILE))),
+        key=os.path.getmtime,
+    )
+    for path in entries[:-keep] if keep > 0 else []:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def cached_block(input_files=(), output_files=(), params=(), env=(), modules=(), bypass=None):
+    """
+    Decorador para la función de un bloque de Mage (se pone debajo de `@transformer`/`@data_loader`).
+
+    Args:
+        input_files: archivos o directorios que el bloque lee de disco (su contenido entra en la llave).
+        output_files: archivos o directorios que el bloque escribe; se guardan y se restauran en un acierto.
+        params: variables del pipeline (`kwargs`) que cambian el resultado del bloque.
+        env: variables de entorno que cambian el resultado del bloque.
+        modules: módulos importados por el bloque cuyo código también entra en la llave.
+        bypass: función opcional que recibe los `kwargs` y devuelve True cuando la corrida no se puede
+            cachear (por ejemplo, porque lee datos de la base que no entran en la llave).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled() or (bypass is not None and bypass(kwargs)):
+                return function(*args, **kwargs)
+
+            cache_dir = os.getenv("BLOCK_CACHE_DIR", BLOCK_CACHE_DIR)
+            # Varios bloques se llaman `transform`: se identifica el bloque por su archivo
+            block = os.path.splitext(os.path.basename(function.__code__.co_filename))[0] or function.__name__
+            block_params = {
+                "kwargs": {name: kwargs.get(name) for name in params},
+                "env": {name: os.getenv(name) for name in env},
+            }
+            key = cache_key(function, args, block_params, input_files, modules)
+            entry_dir = os.path.join(cache_dir, block, key)
+            manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+
+            if os.path.isfile(manifest_path):
+                started = time.perf_counter()
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                restored = 0
+                for path, stored in manifest["output_files"].items():
+                    if _path_digest(path) != stored["digest"]:
+                        _copy_path(os.path.join(entry_dir, stored["name"]), path, publish=True)
+                        restored += 1
+                value = _load_value(manifest["layout"], entry_dir)
+                os.utime(entry_dir)
+                load_s = time.perf_counter() - started
+                saved_s = max(0.0, manifest["elapsed_s"] - load_s)
+                print(
+                    f"Caché de bloques: acierto en `{block}` ({key}); se restauraron {restored} archivos "
+                    f"en {load_s:.2f}s y se ahorraron {saved_s:.2f}s."
+                )
+                _log_run(cache_dir, {
+                    "timestamp": datetime.now().isoformat(), "block": block, "key": key,
+                    "hit": True, "load_s": load_s, "saved_s": saved_s,
+                })
+                return value
+
+            started = time.perf_counter()
+            value = function(*args, **kwargs)
+            elapsed_s = time.perf_counter() - started
+
+            # Guardar en un directorio temporal y renombrar: un fallo a medias no deja una entrada inválida
+            tmp_dir = f"{entry_dir}.tmp-{uuid.uuid4().hex[:8]}"
+            os.makedirs(tmp_dir)
+            try:
+                stored_files = {}
+                for i, path in enumerate(output_files):
+                    if not os.path.exists(path):
+                        continue
+                    name = f"file_{i}_{os.path.basename(path.rstrip(os.sep))}"
+                    _copy_path(path, os.path.join(tmp_dir, name))
+                    stored_files[path] = {"name": name, "digest": _path_digest(path)}
+                manifest = {
+                    "block": block,
+                    "created_at": datetime.now().isoformat(),
+                    "elapsed_s": elapsed_s,
+                    "layout": _dump_value(value, tmp_dir),
+                    "output_files": stored_files,
+                }
+                with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+                    json.dump(manifest, f, indent=2)
+                if os.path.isdir(entry_dir):
+                    shutil.rmtree(entry_dir)
+                os.rename(tmp_dir, entry_dir)
+            except Exception as e:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                print(f"Caché de bloques: no se pudo guardar la salida de `{block}`: {e}")
+            _evict(os.path.join(cache_dir, block), int(os.getenv("BLOCK_CACHE_KEEP", "3")))
+
+            print(f"Caché de bloques: fallo en `{block}` ({key}); el bloque tardó {elapsed_s:.2f}s.")
+            _log_run(cache_dir, {
+                "timestamp": datetime.now().isoformat(), "block": block, "key": key,
+                "hit": False, "elapsed_s": elapsed_s,
+            })
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,172 @@
+import copy
+import io
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from heart_failure_project.utils.compiled_forest import CompiledForest
+from heart_failure_project.utils.forest_artifact import PRECISIONS
+
+# Configuraciones que se prueban por defecto (se pueden reemplazar con COMPACTION_DEPTHS y
+# COMPACTION_TREES en JSON); None es la profundidad del modelo entrenado
+DEFAULT_DEPTHS = [None, 12, 10, 8, 6, 4]
+DEFAULT_TREE_COUNTS = [100, 75, 50, 30, 20, 10]
+
+
+def compaction_settings_from_env() -> dict:
+    latency = os.getenv("COMPACTION_LATENCY_MS")
+    return {
+        "tolerance": float(os.getenv("COMPACTION_TOLERANCE", "0.01")),
+        "latency_ms": float(latency) if latency else None,
+        "depths": json.loads(os.getenv("COMPACTION_DEPTHS", "null")) or DEFAULT_DEPTHS,
+        "tree_counts": json.loads(os.getenv("COMPACTION_TREES", "null")) or DEFAULT_TREE_COUNTS,
+    }
+
+
+def forest_subset(model: RandomForestClassifier, n_trees: int) -> RandomForestClassifier:
+    """
+    Copia del bosque con solo sus primeros `n_trees` árboles (los árboles comparten memoria con el original).
+    """
+    subset = copy.copy(model)
+    subset.estimators_ = model.estimators_[:n_trees]
+    subset.n_estimators = n_trees
+    return subset
+
+
+def joblib_bytes(model) -> int:
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+
+def artifact_bytes(engine: CompiledForest) -> int:
+    return sum(array.nbytes for array in (engine.feature, engine.threshold, engine.left, engine.right, engine.value, engine.roots))
+
+
+def row_latency_ms(engine: CompiledForest, X: np.ndarray, rows: int = 100, repeats: int = 3) -> float:
+    """
+    Latencia por fila como en /predict (una fila por llamada al motor compilado): la mejor de
+    `repeats` pasadas sobre las primeras `rows` filas, para no medir ruido de la máquina.
+    """
+    sample = X[:rows]
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for i in range(len(sample)):
+            engine.predict(sample[i:i + 1])
+        best = min(best, (time.perf_counter() - started) / len(sample))
+    return best * 1000
+
+
+def _evaluate(model, precision: str, X_test: np.ndarray, y_test: np.ndarray) -> tuple:
+    engine = CompiledForest.from_sklearn(model, precision=precision)
+    accuracy = float((engine.predict(X_test) == y_test).mean())
+    return engine, {
+        "max_depth": model.max_depth,
+        "n_estimators": len(model.estimators_),
+        "precision": precision,
+        "accuracy": accuracy,
+        "artifact_bytes": artifact_bytes(engine),
+        "row_latency_ms": None,
+    }
+
+
+def compact_forest(
+    model: RandomForestClassifier,
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_test: pd.DataFrame,
+    y_test: pd.Series,
+    params: dict = None,
+    tolerance: float = 0.01,
+    latency_ms: float = None,
+    depths: list = DEFAULT_DEPTHS,
+    tree_counts: list = DEFAULT_TREE_COUNTS,
+    random_state: int = 42,
+) -> dict:
+    """
+    Busca la versión más chica del bosque cuya precisión sobre los datos de prueba no caiga más
+    de `tolerance` respecto del modelo entrenado y cuya latencia por fila no supere `latency_ms`.
+
+    Para cada profundidad máxima se entrena un bosque con los mismos parámetros (la del modelo
+    se reutiliza), y de cada uno se prueban sus primeros N árboles y ambas precisiones del
+    artefacto (float64 y float32). Devuelve el modelo elegido, con la precisión en
+    `compiled_precision_`, y un reporte de tamaño, latencia y precisión antes y después.
+    """
+    started = time.perf_counter()
+    params = dict(params or {})
+    X_test_array = X_test.to_numpy()
+    y_test_array = y_test.to_numpy()
+
+    baseline_engine, before = _evaluate(model, "float64", X_test_array, y_test_array)
+    before["row_latency_ms"] = row_latency_ms(baseline_engine, X_test_array)
+    before["joblib_bytes"] = joblib_bytes(model)
+    min_accuracy = before["accuracy"] - tolerance
+
+    candidates = []
+    chosen = None
+    chosen_model = model
+    for depth in depths:
+        if depth == model.max_depth:
+            forest = model
+        else:
+            forest = RandomForestClassifier(random_state=random_state, **{**params, "max_depth": depth})
+            forest.fit(X_train, y_train)
+        # Los primeros N árboles de un bosque son los mismos que entrenaría n_estimators=N con la misma semilla
+        for n_trees in sorted({n for n in tree_counts if n < len(forest.estimators_)} | {len(forest.estimators_)}):
+            subset = forest_subset(forest, n_trees)
+            for precision in PRECISIONS:
+                engine, candidate = _evaluate(subset, precision, X_test_array, y_test_array)
+                # La latencia solo se mide para los que cumplen la precisión: es lo más costoso
+                if candidate["accuracy"] >= min_accuracy:
+                    candidate["row_latency_ms"] = row_latency_ms(engine, X_test_array)
+                candidate["eligible"] = candidate["accuracy"] >= min_accuracy and (
+                    latency_ms is None or candidate["row_latency_ms"] <= latency_ms
+                )
+                candidates.append(candidate)
+                if candidate["eligible"] and (
+                    chosen is None
+                    or (candidate["artifact_bytes"], -candidate["accuracy"]) < (chosen["artifact_bytes"], -chosen["accuracy"])
+                ):
+                    chosen = candidate
+                    chosen_model = subset
+
+    if chosen is None:
+        print(f"Ninguna configuración cumple la latencia de {latency_ms} ms por fila; se conserva el modelo entrenado.")
+        after = dict(before)
+    else:
+        chosen_model.compiled_precision_ = chosen["precision"]
+        after = {**chosen, "joblib_bytes": joblib_bytes(chosen_model)}
+        after.pop("eligible")
+
+    return {
+        "model": chosen_model,
+        "report": {
+            "tolerance": tolerance,
+            "latency_target_ms": latency_ms,
+            "before": before,
+            "after": after,
+            "candidates": candidates,
+            "elapsed_s": time.perf_counter() - started,
+        },
+    }
+
+
+def print_compaction_report(report: dict):
+    print(
+        f"Compactación: {len(report['candidates'])} configuraciones probadas en {report['elapsed_s']:.1f}s "
+        f"(tolerancia {report['tolerance']}, latencia objetivo {report['latency_target_ms'] or 'sin límite'} ms por fila)."
+    )
+    for label in ("before", "after"):
+        result = report[label]
+        print(
+            f"  {'Antes' if label == 'before' else 'Después'}: {result['n_estimators']} árboles, profundidad "
+            f"{result['max_depth'] or 'sin límite'}, {result['precision']}: joblib {result['joblib_bytes'] / 1024:.0f} KB, "
+            f"artefacto {result['artifact_bytes'] / 1024:.0f} KB, {result['row_latency_ms']:.3f} ms por fila, "
+            f"accuracy {result['accuracy']:.4f}"
+        )
@@ -0,0 +1,92 @@
+import numpy as np
+
+from heart_failure_project.utils.forest_artifact import flatten_forest, load_forest_artifact
+
+
+class CompiledForest:
+    """
+    Versión "compilada" de un RandomForestClassifier de sklearn.
+
+    Todos los árboles se aplanan en arreglos contiguos de NumPy (feature, threshold,
+    left, right y valor de la hoja) y se recorren en bloque para todas las filas a la vez,
+    evitando la validación y el despacho por árbol que hace sklearn en cada llamada.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, feature_names, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = n_features
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model, precision: str = None):
+        """
+        Aplana los árboles de un RandomForestClassifier ya entrenado, con la precisión del modelo
+        (float64, salvo que la compactación haya elegido float32) o la indicada.
+        """
+        return cls._from_arrays(flatten_forest(model, precision=precision))
+
+    @classmethod
+    def from_artifact(cls, directory: str, mmap_mode: str = "r"):
+        """
+        Carga el artefacto compacto exportado por `train_model` (arreglos .npy + metadata.json),
+        mapeado en memoria por defecto para compartirlo entre workers.
+        """
+        return cls._from_arrays(load_forest_artifact(directory, mmap_mode=mmap_mode))
+
+    @classmethod
+    def _from_arrays(cls, arrays: dict):
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            max_depth=arrays["max_depth"],
+            classes=arrays["classes"],
+            feature_names=np.asarray(arrays["feature_names"], dtype=object),
+            n_features=arrays["n_features"],
+        )
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Devuelve el índice (global) de la hoja alcanzada por cada fila en cada árbol,
+        con forma (n_estimators, n_filas).
+        """
+        # sklearn evalúa los árboles sobre float32, así que convertimos igual para obtener los mismos cortes
+        with np.errstate(over="ignore"):
+            X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Se esperaba una matriz 2D, pero se recibió un arreglo con {X.ndim} dimensiones.")
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Se esperaban {self.n_features_in_} columnas, pero se recibieron {X.shape[1]}.")
+        # Igual que sklearn: no se aceptan valores nulos, NaN ni infinitos
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN, infinity or a value too large for dtype('float32').")
+
+        n_rows = X.shape[0]
+        rows = np.tile(np.arange(n_rows), self.n_estimators)
+        nodes = np.repeat(self.roots, n_rows)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes.reshape(self.n_estimators, n_rows)
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        # La suma sobre el eje de árboles se acumula en el mismo orden que sklearn
+        proba = np.add.reduce(self.value[leaves], axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
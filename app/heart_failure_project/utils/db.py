@@ -0,0 +1,201 @@
+"""
+Acceso compartido a PostgreSQL para los bloques de Mage.
+
+La configuración sale del entorno (las mismas variables de `.env` que usa docker-compose):
+DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, más DB_POOL_MIN, DB_POOL_MAX,
+DB_CONNECT_RETRIES, DB_CONNECT_BACKOFF_S y DB_STATEMENT_TIMEOUT_MS.
+
+Prueba contra un PostgreSQL local (por ejemplo, DB_HOST=localhost DB_PORT=5434 para el de docker-compose):
+    python -m heart_failure_project.utils.db
+"""
+import csv
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+# Filas por cada COPY enviado al servidor
+COPY_BATCH_ROWS = 10000
+
+_pool = None
+_pool_lock = threading.Lock()
+# Limita los préstamos al tamaño del pool: los hilos de más esperan en lugar de recibir PoolError
+_pool_slots = None
+
+
+def db_config_from_env() -> dict:
+    """
+    Parámetros de conexión. Los valores por defecto son los del servicio `heartDB` de docker-compose.
+    """
+    config = {
+        'dbname': os.getenv('DB_NAME', 'heartDB'),
+        'user': os.getenv('DB_USER', 'test'),
+        'password': os.getenv('DB_PASSWORD', 'test123'),
+        'host': os.getenv('DB_HOST', 'heartDB'),
+        'port': os.getenv('DB_PORT', '5432'),
+    }
+    statement_timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '300000'))
+    if statement_timeout_ms > 0:
+        # Ninguna consulta de los ETL puede quedarse colgada indefinidamente
+        config['options'] = f'-c statement_timeout={statement_timeout_ms}'
+    return config
+
+
+def with_retries(action, retries: int = None, backoff: float = None):
+    """
+    Ejecuta `action()` y reintenta con espera exponencial si la base de datos no está disponible.
+    """
+    retries = int(os.getenv('DB_CONNECT_RETRIES', '5')) if retries is None else retries
+    backoff = float(os.getenv('DB_CONNECT_BACKOFF_S', '0.5')) if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return action()
+        except psycopg2.OperationalError as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"No se pudo conectar a la base de datos ({str(e).strip()}); reintento en {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def get_pool() -> pg_pool.ThreadedConnectionPool:
+    """
+    Pool de conexiones del proceso, creado la primera vez que se usa.
+    """
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            config = db_config_from_env()
+            max_connections = int(os.getenv('DB_POOL_MAX', '5'))
+            print(f"Conectando a la base de datos en {config['host']}:{config['port']}...")
+            _pool = with_retries(lambda: pg_pool.ThreadedConnectionPool(
+                int(os.getenv('DB_POOL_MIN', '1')),
+                max_connections,
+                **config,
+            ))
+            _pool_slots = threading.BoundedSemaphore(max_connections)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def connection():
+    """
+    Presta una conexión del pool: confirma la transacción al salir o la revierte si hubo un error.
+    """
+    db_pool = get_pool()
+    slots = _pool_slots
+    slots.acquire()
+    try:
+        conn = with_retries(db_pool.getconn)
+    except Exception:
+        slots.release()
+        raise
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        # Una conexión cerrada o rota se descarta en lugar de volver al pool
+        db_pool.putconn(conn, close=broken or bool(conn.closed))
+        slots.release()
+
+
+def copy_rows(cursor, table: str, columns, rows, batch_rows: int = COPY_BATCH_ROWS) -> int:
+    """
+    Carga filas con `COPY ... FROM STDIN` en formato CSV, por bloques de `batch_rows` para no
+    construir toda la carga en memoria. `rows` puede ser cualquier iterable; devuelve cuántas se cargaron.
+
+    None se carga como NULL (igual que una cadena vacía, por las reglas de CSV de COPY).
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_rows:
+            total += _copy_buffer(cursor, sql, buffer, pending)
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        total += _copy_buffer(cursor, sql, buffer, pending)
+    return total
+
+
+def _copy_buffer(cursor, sql, buffer, pending) -> int:
+    buffer.seek(0)
+    cursor.copy_expert(sql, buffer)
+    return pending
+
+
+def stream_query(conn, query: str, params=None, itersize: int = 10000):
+    """
+    Recorre el resultado de una consulta con un cursor del lado del servidor: solo `itersize`
+    filas viven en memoria a la vez.
+    """
+    with conn.cursor(name=f"stream_{threading.get_ident()}_{time.monotonic_ns()}") as cursor:
+        cursor.itersize = itersize
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+
+
+if __name__ == '__main__':
+    # Prueba rápida contra la base configurada en el entorno (usa una tabla temporal)
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            print(f"statement_timeout = {cursor.fetchone()[0]}")
+            cursor.execute("CREATE TEMP TABLE db_utils_check (id INTEGER, payload JSONB, note TEXT)")
+            rows = ((i, '{"a": [1, "x,\\"y"]}', 'línea\nnueva' if i % 2 else None) for i in range(25000))
+            loaded = copy_rows(cursor, 'db_utils_check', ('id', 'payload', 'note'), rows)
+        streamed = sum(1 for _ in stream_query(conn, "SELECT id, payload, note FROM db_utils_check ORDER BY id", itersize=1000))
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT payload, note FROM db_utils_check WHERE id = 1")
+            payload, note = cursor.fetchone()
+    assert loaded == streamed == 25000, f"Se cargaron {loaded} filas y se leyeron {streamed}."
+    assert payload == {"a": [1, 'x,"y']} and note == 'línea\nnueva', f"Valores alterados por COPY: {payload!r}, {note!r}"
+
+    # Los hilos comparten el pool sin pisarse
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                with connection() as conn, conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    assert cursor.fetchone()[0] == 1
+        except Exception as e:
+            errors.append(e)
+
+    # Más hilos que conexiones: los que sobran esperan su turno
+    threads = [threading.Thread(target=worker) for _ in range(2 * int(os.getenv('DB_POOL_MAX', '5')))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, f"Errores en hilos: {errors}"
+    close_pool()
+    print("Utilidades de base de datos verificadas: COPY, lectura en streaming y pool compartido entre hilos.")
@@ -0,0 +1,17 @@
+import numpy as np
+
+# Codificación de las variables categóricas. Es la que usa el bloque `preprocess` para entrenar
+# el modelo, así que main.py debe codificar exactamente igual al servir.
+CATEGORICAL_MAPPINGS = {
+    "Sex": {"M": 1, "F": 0},
+    "ChestPainType": {"ATA": 0, "NAP": 1, "ASY": 2, "TA": 3},
+    "RestingECG": {"Normal": 0, "ST": 1, "LVH": 2},
+    "ExerciseAngina": {"Y": 1, "N": 0},
+    "ST_Slope": {"Up": 0, "Flat": 1, "Down": 2},
+}
+
+# Para codificar columnas completas: categorías en orden fijo y el código de cada una en la misma posición
+CATEGORY_LEVELS = {column: list(mapping) for column, mapping in CATEGORICAL_MAPPINGS.items()}
+CATEGORY_CODES = {
+    column: np.array(list(mapping.values()), dtype=np.int64) for column, mapping in CATEGORICAL_MAPPINGS.items()
+}
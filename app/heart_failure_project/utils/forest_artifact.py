@@ -0,0 +1,230 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+# Marca que usa sklearn para indicar que un nodo es una hoja
+TREE_LEAF = -1
+
+# Arreglos que forman el artefacto compacto (un archivo .npy por arreglo)
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+METADATA_FILE = "metadata.json"
+
+# Versiones anteriores del artefacto que se conservan junto a la activa (un lector que resolvió
+# el enlace justo antes del cambio puede seguir leyéndolas)
+ARTIFACT_KEEP = 2
+
+# Precisión de los arreglos: float64 reproduce sklearn bit a bit; float32 guarda umbrales y hojas
+# en float32 e índices en int32 (aproximadamente la mitad del tamaño)
+PRECISIONS = {
+    "float64": {"float": np.float64, "int": np.int64},
+    "float32": {"float": np.float32, "int": np.int32},
+}
+
+
+def file_version(path: str) -> str:
+    """
+    Versión de un modelo: los primeros 12 caracteres del SHA-256 de su archivo joblib.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def save_model(model, path: str):
+    """
+    Guarda el modelo con joblib en un archivo temporal y lo renombra sobre `path`: la API, que vigila
+    ese archivo para recargarlo, nunca lee uno escrito a medias.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def model_precision(model) -> str:
+    """
+    Precisión con la que se compila el modelo: la que eligió la compactación (`compiled_precision_`) o float64.
+    """
+    return getattr(model, "compiled_precision_", "float64")
+
+
+def float32_thresholds(threshold: np.ndarray) -> np.ndarray:
+    """
+    Convierte umbrales a float32 redondeando hacia abajo: para una entrada float32 `x`,
+    `x <= t` vale lo mismo con el umbral original que con el convertido.
+    """
+    converted = threshold.astype(np.float32)
+    rounded_up = converted.astype(np.float64) > threshold
+    converted[rounded_up] = np.nextafter(converted[rounded_up], np.float32(-np.inf))
+    return converted
+
+
+def flatten_forest(model, precision: str = None) -> dict:
+    """
+    Aplana los árboles de un RandomForestClassifier en arreglos contiguos de NumPy.
+
+    Las hojas apuntan a sí mismas (umbral infinito), de modo que el recorrido puede iterar
+    un número fijo de pasos, y `value` guarda las probabilidades ya normalizadas por hoja.
+    Sin `precision` se usa la del modelo (ver `model_precision`).
+    """
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Solo se soportan modelos con una única variable objetivo.")
+    precision = precision or model_precision(model)
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisión no soportada: '{precision}'. Use 'float64' o 'float32'.")
+    int_dtype = PRECISIONS[precision]["int"]
+    float_dtype = PRECISIONS[precision]["float"]
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        is_leaf = tree.children_left == TREE_LEAF
+        node_ids = np.arange(n_nodes, dtype=np.int64)
+
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, tree.threshold)
+
+        # Mismas probabilidades por hoja que DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :].copy()
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value /= normalizer
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        values.append(value)
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    threshold = np.concatenate(thresholds)
+    if float_dtype is np.float32:
+        threshold = float32_thresholds(threshold)
+
+    return {
+        "feature": np.ascontiguousarray(np.concatenate(features), dtype=int_dtype),
+        "threshold": np.ascontiguousarray(threshold, dtype=float_dtype),
+        "left": np.ascontiguousarray(np.concatenate(lefts), dtype=int_dtype),
+        "right": np.ascontiguousarray(np.concatenate(rights), dtype=int_dtype),
+        "value": np.ascontiguousarray(np.concatenate(values), dtype=float_dtype),
+        "roots": np.asarray(roots, dtype=int_dtype),
+        "classes": np.asarray(model.classes_),
+        "precision": precision,
+        "max_depth": int(max_depth),
+        "feature_names": [str(name) for name in getattr(model, "feature_names_in_", [])],
+        "n_features": int(model.n_features_in_),
+    }
+
+
+def save_forest_artifact(model, directory: str, version: str) -> str:
+    """
+    Exporta el modelo como un directorio de arreglos .npy crudos más un metadata.json.
+
+    El directorio se escribe primero en una ruta temporal y luego se publica con
+    `publish_directory`, para que la API nunca lea un artefacto a medio escribir ni ausente.
+    """
+    flat = flatten_forest(model)
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(tmp_directory, f"{name}.npy"), flat[name], allow_pickle=False)
+
+    metadata = {
+        "version": version,
+        "created_at": datetime.now().isoformat(),
+        "feature_names": flat["feature_names"],
+        "n_features": flat["n_features"],
+        "n_estimators": len(flat["roots"]),
+        "n_nodes": len(flat["feature"]),
+        "max_depth": flat["max_depth"],
+        "precision": flat["precision"],
+        "arrays": {name: {"dtype": str(flat[name].dtype), "shape": list(flat[name].shape)} for name in ARRAY_NAMES},
+    }
+    with open(os.path.join(tmp_directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    publish_directory(tmp_directory, directory)
+    return directory
+
+
+def publish_directory(source_dir: str, directory: str, keep: int = ARTIFACT_KEEP):
+    """
+    Publica `source_dir` (ya completo) como `directory`.
+
+    `directory` es un enlace simbólico a un directorio versionado (`<nombre>.v<ns>`) que está a su
+    lado: el directorio nuevo se mueve a su versión y el enlace se reemplaza con un solo rename
+    atómico, así `directory` siempre existe y apunta a un artefacto completo. Se conservan las
+    `keep` versiones anteriores más recientes y se borran las demás.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    name = os.path.basename(os.path.normpath(directory))
+    version_name = f"{name}.v{time.time_ns()}"
+    os.rename(source_dir, os.path.join(parent, version_name))
+
+    if os.path.isdir(directory) and not os.path.islink(directory):
+        # Artefacto con el formato anterior (un directorio real): se convierte en una versión más.
+        # Solo en esta migración queda un instante sin `directory`
+        os.rename(directory, os.path.join(parent, f"{name}.v0"))
+
+    tmp_link = os.path.join(parent, f"{name}.link-{os.getpid()}")
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(version_name, tmp_link)
+    os.replace(tmp_link, directory)
+
+    pattern = re.compile(re.escape(name) + r"\.v(\d+)$")
+    versions = sorted(
+        (int(match.group(1)), path)
+        for path in glob.glob(os.path.join(parent, f"{glob.escape(name)}.v*"))
+        if (match := pattern.search(os.path.basename(path))) and os.path.basename(path) != version_name
+    )
+    for _, path in versions[:-keep] if keep > 0 else versions:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_forest_artifact(directory: str, mmap_mode: str = "r") -> dict:
+    """
+    Lee el artefacto compacto. Con `mmap_mode="r"` los arreglos se mapean en memoria, así
+    todos los workers de uvicorn comparten las mismas páginas del page cache.
+    """
+    # Resolver el enlace una sola vez: todos los archivos salen de la misma versión aunque se publique otra
+    directory = os.path.realpath(directory)
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        raise FileNotFoundError(f"No se encontró el artefacto del modelo en {directory}.")
+
+    with open(metadata_path, "r") as f:
+        metadata = json.load(f)
+
+    arrays = {
+        # np.asarray convierte el memmap en un ndarray que sigue apuntando a las mismas páginas
+        name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False))
+        for name in ARRAY_NAMES
+    }
+    arrays["max_depth"] = metadata["max_depth"]
+    arrays["feature_names"] = metadata["feature_names"]
+    arrays["n_features"] = metadata["n_features"]
+    arrays["metadata"] = metadata
+    return arrays
@@ -0,0 +1,304 @@
+"""
+Imputación de valores faltantes con estadísticas por columna.
+
+`ColumnImputer.fit` calcula de una vez, sobre el arreglo completo, la mediana, la media, la moda y los
+cuantiles de todas las columnas numéricas (y la moda de las categóricas). `fit_chunks` hace lo mismo
+con un iterador de DataFrames (por ejemplo `read_heart_csv(path, chunksize=...)`) usando un histograma
+acotado por columna: mientras una columna tenga a lo sumo `max_bins` valores distintos (el caso de los
+datos clínicos) las estadísticas son exactas; si tiene más, los cuantiles son aproximados.
+
+Las estadísticas se guardan en JSON para que otros procesos las reutilicen sin recalcularlas.
+
+Uso (desde el directorio del proyecto de Mage):
+    python -m heart_failure_project.utils.imputation data/heart.csv
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ("median", "mean", "mode")
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _compress(values: np.ndarray, counts: np.ndarray, max_bins: int) -> tuple:
+    """
+    Reduce el histograma a lo sumo `max_bins` centroides de peso parecido (igual frecuencia): cada
+    centroide queda en el promedio ponderado de los valores que agrupa, así que el error de rango
+    de un cuantil es del orden de 1 / `max_bins`.
+    """
+    before = np.cumsum(counts) - counts
+    groups = np.floor(before * max_bins / counts.sum()).astype(np.int64)
+    sizes = np.bincount(groups, weights=counts)
+    sums = np.bincount(groups, weights=values * counts)
+    used = sizes > 0
+    return sums[used] / sizes[used], sizes[used]
+
+
+def _sketch_quantiles(values: np.ndarray, counts: np.ndarray, quantiles) -> np.ndarray:
+    """
+    Cuantiles con la misma interpolación lineal que `np.quantile`, leídos del histograma acumulado.
+    """
+    n = counts.sum()
+    cumulative = np.cumsum(counts)
+    position = (n - 1) * np.asarray(quantiles, dtype=np.float64)
+    lower = np.floor(position)
+    lower_value = values[np.searchsorted(cumulative, lower, side="right")]
+    upper_value = values[np.searchsorted(cumulative, np.minimum(lower + 1, n - 1), side="right")]
+    return lower_value + (position - lower) * (upper_value - lower_value)
+
+
+def _to_python(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ColumnImputer:
+    """
+    Completa los valores faltantes de cada columna con su mediana, media o moda.
+
+    Las columnas no numéricas (texto o `category`) siempre se completan con la moda.
+    """
+
+    def __init__(self, strategy: str = "median", quantiles=DEFAULT_QUANTILES, max_bins: int = 4096, columns: list = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia no soportada: '{strategy}'. Use una de {STRATEGIES}.")
+        self.strategy = strategy
+        self.quantiles = tuple(quantiles)
+        self.max_bins = max_bins
+        self.columns = columns
+        self.statistics_ = None
+
+    def _split_columns(self, df: pd.DataFrame) -> tuple:
+        columns = self.columns or list(df.columns)
+        numeric = [
+            column for column in columns
+            if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+        ]
+        return numeric, [column for column in columns if column not in numeric]
+
+    def fit(self, df: pd.DataFrame) -> "ColumnImputer":
+        """
+        Estadísticas exactas sobre el DataFrame completo, con una sola pasada vectorizada por todas las columnas numéricas.
+        """
+        numeric, categorical = self._split_columns(df)
+        statistics = {}
+        if numeric:
+            # Un solo ordenamiento de todas las columnas (los NaN quedan al final de cada una):
+            # los cuantiles, la mediana y la moda salen del arreglo ordenado
+            ordered = np.sort(df[numeric].to_numpy(dtype=np.float64), axis=0)
+            counts = (~np.isnan(ordered)).sum(axis=0)
+            columns = np.arange(len(numeric))
+            sums = np.nansum(ordered, axis=0)
+
+            def quantile(q):
+                position = (np.maximum(counts, 1) - 1) * q
+                lower = np.floor(position).astype(np.int64)
+                upper = np.minimum(lower + 1, np.maximum(counts, 1) - 1)
+                low, high = ordered[lower, columns], ordered[upper, columns]
+                return np.where(counts > 0, low + (position - lower) * (high - low), np.nan)
+
+            quantiles = {str(q): quantile(q) for q in self.quantiles}
+            medians = quantile(0.5)
+            for i, column in enumerate(numeric):
+                values = ordered[:counts[i], i]
+                if len(values):
+                    # Moda: la corrida más larga de valores iguales (ante un empate, el menor valor)
+                    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+                    runs = np.diff(np.append(starts, len(values)))
+                    mode = float(values[starts[np.argmax(runs)]])
+                else:
+                    mode = float("nan")
+                statistics[column] = {
+                    "kind": "numeric",
+                    "count": int(counts[i]),
+                    "missing": int(len(df) - counts[i]),
+                    "median": float(medians[i]),
+                    "mean": float(sums[i] / counts[i]) if counts[i] else float("nan"),
+                    "mode": mode,
+                    "quantiles": {q: float(values_[i]) for q, values_ in quantiles.items()},
+                    "exact": True,
+                }
+        for column in categorical:
+            value_counts = df[column].value_counts(dropna=True)
+            statistics[column] = self._categorical_statistics(value_counts, int(df[column].isna().sum()))
+        self.statistics_ = statistics
+        return self
+
+    def fit_chunks(self, chunks) -> "ColumnImputer":
+        """
+        Estadísticas sobre un iterador de DataFrames, con memoria acotada por `max_bins` centroides por columna.
+        """
+        sketches = {}
+        category_counts = {}
+        missing = {}
+        totals = {}
+        numeric = categorical = None
+        for chunk in chunks:
+            if numeric is None:
+                numeric, categorical = self._split_columns(chunk)
+                sketches = {column: (np.empty(0), np.empty(0), True) for column in numeric}
+            for column in numeric:
+                values = chunk[column].to_numpy(dtype=np.float64)
+                values = values[~np.isnan(values)]
+                missing[column] = missing.get(column, 0) + len(chunk) - len(values)
+                totals[column] = totals.get(column, 0.0) + float(values.sum())
+
+                # Unir el histograma del bloque con el acumulado
+                old_values, old_counts, exact = sketches[column]
+                new_values, new_counts = np.unique(values, return_counts=True)
+                merged, inverse = np.unique(np.concatenate([old_values, new_values]), return_inverse=True)
+                merged_counts = np.bincount(inverse, weights=np.concatenate([old_counts, new_counts]), minlength=len(merged))
+                if len(merged) > self.max_bins:
+                    merged, merged_counts = _compress(merged, merged_counts, self.max_bins)
+                    exact = False
+                sketches[column] = (merged, merged_counts, exact)
+            for column in categorical:
+                counts = chunk[column].value_counts(dropna=True)
+                category_counts[column] = category_counts[column].add(counts, fill_value=0) if column in category_counts else counts
+                missing[column] = missing.get(column, 0) + int(chunk[column].isna().sum())
+
+        if numeric is None:
+            raise ValueError("No se recibió ningún bloque de datos para ajustar la imputación.")
+
+        statistics = {}
+        for column in numeric:
+            values, counts, exact = sketches[column]
+            count = int(counts.sum())
+            if count:
+                quantiles = _sketch_quantiles(values, counts, self.quantiles)
+                median = float(_sketch_quantiles(values, counts, [0.5])[0])
+                mode = float(values[np.argmax(counts)])
+            else:
+                quantiles = np.full(len(self.quantiles), np.nan)
+                median = mode = float("nan")
+            statistics[column] = {
+                "kind": "numeric",
+                "count": count,
+                "missing": int(missing[column]),
+                "median": median,
+                "mean": totals[column] / count if count else float("nan"),
+                "mode": mode,
+                "quantiles": {str(q): float(value) for q, value in zip(self.quantiles, quantiles)},
+                "exact": exact,
+            }
+        for column in categorical:
+            value_counts = category_counts.get(column, pd.Series(dtype=np.int64))
+            statistics[column] = self._categorical_statistics(value_counts, missing[column])
+        self.statistics_ = statistics
+        return self
+
+    @staticmethod
+    def _categorical_statistics(value_counts: pd.Series, missing: int) -> dict:
+        value_counts = value_counts[value_counts > 0]
+        if len(value_counts):
+            # Ante un empate, la primera en orden (como `DataFrame.mode`)
+            top = value_counts[value_counts == value_counts.max()]
+            mode = _to_python(sorted(top.index)[0])
+        else:
+            mode = None
+        return {"kind": "categorical", "count": int(value_counts.sum()), "missing": int(missing), "mode": mode}
+
+    @property
+    def fill_values_(self) -> dict:
+        if self.statistics_ is None:
+            raise ValueError("La imputación no está ajustada: llame a `fit` o `fit_chunks` primero.")
+        return {
+            column: stats["mode"] if stats["kind"] == "categorical" else stats[self.strategy]
+            for column, stats in self.statistics_.items()
+        }
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Completa todas las columnas con un solo `fillna` (devuelve un DataFrame nuevo).
+        """
+        fill_values = {
+            column: value for column, value in self.fill_values_.items()
+            if column in df.columns and value is not None and not (isinstance(value, float) and np.isnan(value))
+        }
+        return df.fillna(value=fill_values)
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+    def save(self, path: str):
+        if self.statistics_ is None:
+            raise ValueError("La imputación no está ajustada: llame a `fit` o `fit_chunks` primero.")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        payload = {
+            "strategy": self.strategy,
+            "quantiles": list(self.quantiles),
+            "max_bins": self.max_bins,
+            "columns": self.columns,
+            "statistics": self.statistics_,
+        }
+        with open(path + ".tmp", "w") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnImputer":
+        with open(path) as f:
+            payload = json.load(f)
+        imputer = cls(payload["strategy"], payload["quantiles"], payload["max_bins"], payload["columns"])
+        imputer.statistics_ = payload["statistics"]
+        return imputer
+
+
+if __name__ == "__main__":
+    # Prueba rápida: medianas exactas, lectura por bloques y velocidad frente a la versión anterior
+    from heart_failure_project.utils.schema import read_heart_csv
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "heart.csv")
+    df = pd.read_csv(csv_path)
+    numeric = df.select_dtypes("number").columns
+
+    imputer = ColumnImputer().fit(df)
+    for column in numeric:
+        assert imputer.statistics_[column]["median"] == df[column].median(), f"Mediana distinta en {column}."
+        assert np.isclose(imputer.statistics_[column]["mean"], df[column].mean()), f"Media distinta en {column}."
+        assert imputer.statistics_[column]["mode"] == df[column].mode().iloc[0], f"Moda distinta en {column}."
+    assert imputer.statistics_["ChestPainType"]["mode"] == df["ChestPainType"].mode().iloc[0]
+
+    chunked = ColumnImputer().fit_chunks(read_heart_csv(csv_path, chunksize=100))
+    for column in numeric:
+        for key in ("median", "mode", "count"):
+            assert np.isclose(chunked.statistics_[column][key], imputer.statistics_[column][key]), f"{key} distinto en {column}."
+        assert np.allclose(list(chunked.statistics_[column]["quantiles"].values()), list(imputer.statistics_[column]["quantiles"].values()))
+    print(f"Medianas, medias, modas y cuantiles exactos en {csv_path} (completo y por bloques).")
+
+    # Cuantiles aproximados de una columna continua con más valores distintos que centroides:
+    # error de rango (fracción de los datos por debajo del valor estimado contra el cuantil pedido)
+    rng = np.random.default_rng(0)
+    continuous = pd.DataFrame({"x": rng.lognormal(size=200_000)})
+    sketch = ColumnImputer(max_bins=1024).fit_chunks(continuous.iloc[i:i + 10_000] for i in range(0, len(continuous), 10_000))
+    estimated = np.array(list(sketch.statistics_["x"]["quantiles"].values()))
+    rank_error = np.abs(np.searchsorted(np.sort(continuous["x"]), estimated) / len(continuous) - np.array(DEFAULT_QUANTILES))
+    assert not sketch.statistics_["x"]["exact"] and rank_error.max() < 0.005, f"Error de rango de los cuantiles: {rank_error.max():.4f}"
+    print(f"Cuantiles aproximados con 1024 centroides: error de rango máximo {rank_error.max():.4%}.")
+
+    # Velocidad frente a la versión anterior (lista ordenada en Python y un fillna por columna)
+    wide = pd.concat([df[numeric]] * 200, ignore_index=True).astype(np.float64)
+    wide = wide.mask(rng.random(wide.shape) < 0.05)
+    started = time.perf_counter()
+    legacy = wide.copy()
+    for column in legacy.columns:
+        values = sorted(legacy[column].dropna().tolist())
+        legacy[[column]] = legacy[[column]].fillna(values[len(values) // 2])
+    legacy_s = time.perf_counter() - started
+    started = time.perf_counter()
+    filled = ColumnImputer().fit_transform(wide)
+    new_s = time.perf_counter() - started
+    assert not filled.isna().any().any()
+    print(f"{len(wide)} filas: versión anterior {legacy_s:.3f}s, ColumnImputer {new_s:.3f}s ({legacy_s / new_s:.1f}x).")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "imputation_stats.json")
+        imputer.save(path)
+        assert ColumnImputer.load(path).fill_values_ == imputer.fill_values_
+    print("Prueba pasada: las estadísticas guardadas se leen igual.")
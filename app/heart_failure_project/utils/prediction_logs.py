@@ -0,0 +1,53 @@
+"""
+Consultas compartidas sobre `prediction_logs` para los bloques que la leen de forma incremental
+(evaluaciones, tablas del dashboard y entrenamiento incremental).
+
+Los bloques recuerdan el último id procesado y en cada corrida leen solo los ids mayores. El id es
+serial: una transacción puede confirmar filas con ids menores que las de otra transacción que ya
+confirmó, así que `MAX(id)` no sirve como marca de agua. `committed_log_id` devuelve un límite
+superior que ya no puede cambiar.
+
+`request` y `predictions` se convierten explícitamente a JSONB: las consultas funcionan igual si las
+columnas son JSONB o TEXT.
+"""
+from heart_failure_project.utils.db import connection
+
+# Por cada log entre `last_log_id` (excluido) y `max_log_id`: la etiqueta real (`HeartDisease` del primer
+# registro de la solicitud) y la primera predicción; ambas en NULL si falta alguna de las dos
+LABELLED_LOGS_SQL = """
+labelled_logs AS (
+    SELECT
+        id,
+        timestamp,
+        CASE WHEN jsonb_typeof(y_true) = 'number' AND jsonb_typeof(y_pred) = 'number'
+             THEN (y_true::text)::numeric = 1 END AS is_positive,
+        CASE WHEN jsonb_typeof(y_true) = 'number' AND jsonb_typeof(y_pred) = 'number'
+             THEN (y_pred::text)::numeric = 1 END AS predicted_positive
+    FROM (
+        SELECT
+            id,
+            timestamp,
+            CASE WHEN jsonb_typeof(request::jsonb) = 'array' THEN request::jsonb -> 0 ELSE request::jsonb END
+                -> 'HeartDisease' AS y_true,
+            CASE WHEN jsonb_typeof(predictions::jsonb) = 'array' THEN predictions::jsonb -> 0 END AS y_pred
+        FROM prediction_logs
+        WHERE id > %(last_log_id)s AND id <= %(max_log_id)s
+    ) AS new_logs
+)
+"""
+
+
+def committed_log_id() -> int:
+    """
+    Mayor id de `prediction_logs` por debajo del cual ya no pueden aparecer filas nuevas.
+
+    Toma un bloqueo SHARE sobre la tabla en una transacción corta: espera a que terminen las
+    inserciones en curso (el ETL de logs y las del dashboard de Shiny) y no deja empezar otras hasta
+    leer `MAX(id)`. Los ids que se asignen después son mayores, así que todas las filas con id menor o
+    igual ya están confirmadas. Se llama antes de abrir la transacción del bloque para no bloquear
+    las inserciones mientras se procesan los logs.
+    """
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("LOCK TABLE prediction_logs IN SHARE MODE;")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM prediction_logs;")
+        return cursor.fetchone()[0]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from heart_failure_project.utils.encoding import CATEGORY_LEVELS
+
+# Tipos explícitos de data/heart.csv: enteros del menor ancho que cubre los valores clínicos,
+# `category` con las categorías de la codificación de entrenamiento y float32 para Oldpeak
+HEART_SCHEMA = {
+    "Age": "int8",
+    "Sex": pd.CategoricalDtype(CATEGORY_LEVELS["Sex"]),
+    "ChestPainType": pd.CategoricalDtype(CATEGORY_LEVELS["ChestPainType"]),
+    "RestingBP": "int16",
+    "Cholesterol": "int16",
+    "FastingBS": "int8",
+    "RestingECG": pd.CategoricalDtype(CATEGORY_LEVELS["RestingECG"]),
+    "MaxHR": "int16",
+    "ExerciseAngina": pd.CategoricalDtype(CATEGORY_LEVELS["ExerciseAngina"]),
+    "Oldpeak": "float32",
+    "ST_Slope": pd.CategoricalDtype(CATEGORY_LEVELS["ST_Slope"]),
+    "HeartDisease": "int8",
+}
+
+INTEGER_COLUMNS = [column for column, dtype in HEART_SCHEMA.items() if isinstance(dtype, str) and dtype.startswith("int")]
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pasa las columnas enteras al ancho del esquema, verificando el rango: read_csv con un dtype
+    angosto desborda en silencio (300 como int8 se lee como 44), así que se leen como int64 y se
+    convierten acá. Una columna entera con valores faltantes queda en float32 para conservar los nulos.
+    """
+    for column in INTEGER_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if values.isna().any():
+            df[column] = values.astype(np.float32)
+            continue
+        info = np.iinfo(HEART_SCHEMA[column])
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(
+                f"La columna '{column}' tiene valores fuera del rango de {HEART_SCHEMA[column]} "
+                f"({values.min()} a {values.max()})."
+            )
+        df[column] = values.astype(HEART_SCHEMA[column])
+    return df
+
+
+def read_heart_csv(path: str, chunksize: int = None):
+    """
+    Lee el CSV con el esquema explícito. Con `chunksize` devuelve un iterador de DataFrames de
+    a lo sumo `chunksize` filas, para procesar archivos más grandes que la memoria.
+    """
+    parse_dtypes = {column: dtype for column, dtype in HEART_SCHEMA.items() if column not in INTEGER_COLUMNS}
+    if chunksize:
+        return (apply_schema(chunk) for chunk in pd.read_csv(path, dtype=parse_dtypes, chunksize=chunksize))
+    return apply_schema(pd.read_csv(path, dtype=parse_dtypes))
@@ -0,0 +1,214 @@
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from heart_failure_project.utils.encoding import CATEGORICAL_MAPPINGS
+
+# Grilla por defecto del modo `cv` (se puede reemplazar con TRAINING_GRID en JSON)
+DEFAULT_PARAM_GRID = {
+    "n_estimators": [100, 300],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 3],
+    "max_features": ["sqrt", 0.5],
+}
+
+CV_CACHE_DIR = os.path.join("data", "cache", "cv")
+
+# Datos de cada worker del pool (se envían una sola vez, al crear el proceso)
+_worker_data = {}
+
+
+def process_pool_context():
+    """
+    Contexto de multiprocessing para los pools de procesos: fork donde exista, porque con spawn cada
+    worker vuelve a importar el módulo principal (Mage, un notebook o un script sin
+    `if __name__ == "__main__"`), lo que rompe el pool.
+    """
+    return mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+
+
+def param_grid_from_env() -> dict:
+    grid = os.getenv("TRAINING_GRID")
+    return json.loads(grid) if grid else DEFAULT_PARAM_GRID
+
+
+def expand_grid(param_grid: dict) -> list:
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def load_cv_data(X: pd.DataFrame, y: pd.Series, n_splits: int, random_state: int, cache_dir: str = CV_CACHE_DIR) -> dict:
+    """
+    Arreglos de entrenamiento y particiones de la validación cruzada.
+
+    Se guardan en disco con una llave que depende del contenido de los datos, así una corrida
+    diaria con los mismos datos reutiliza los arreglos y las particiones en lugar de rehacerlos.
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).values.tobytes())
+    digest.update(json.dumps([list(map(str, X.columns)), n_splits, random_state]).encode("utf-8"))
+    cache_path = os.path.join(cache_dir, f"{digest.hexdigest()[:16]}.npz")
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        folds = [cached[f"test_{i}"] for i in range(n_splits)]
+        print(f"Particiones de validación cruzada leídas de la caché {cache_path}.")
+        return {"X": cached["X"], "y": cached["y"], "folds": folds}
+
+    X_array = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+    y_array = y.to_numpy()
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    folds = [test_index for _, test_index in splitter.split(X_array, y_array)]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + f".tmp-{os.getpid()}.npz"
+    np.savez(tmp_path, X=X_array, y=y_array, **{f"test_{i}": fold for i, fold in enumerate(folds)})
+    os.replace(tmp_path, cache_path)
+    print(f"Particiones de validación cruzada guardadas en la caché {cache_path}.")
+    return {"X": X_array, "y": y_array, "folds": folds}
+
+
+def _init_worker(X, y, folds, feature_names):
+    _worker_data.update(X=X, y=y, folds=folds, feature_names=feature_names)
+
+
+def _fit_fold(config_index: int, params: dict, fold_index: int, random_state: int) -> dict:
+    X, y = _worker_data["X"], _worker_data["y"]
+    test_index = _worker_data["folds"][fold_index]
+    train_mask = np.ones(len(y), dtype=bool)
+    train_mask[test_index] = False
+    X_train = pd.DataFrame(X[train_mask], columns=_worker_data["feature_names"])
+    X_test = pd.DataFrame(X[test_index], columns=_worker_data["feature_names"])
+
+    started = time.perf_counter()
+    model = RandomForestClassifier(random_state=random_state, **params)
+    model.fit(X_train, y[train_mask])
+    fit_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    accuracy = float((model.predict(X_test) == y[test_index]).mean())
+    score_s = time.perf_counter() - started
+    return {"config": config_index, "fold": fold_index, "accuracy": accuracy, "fit_s": fit_s, "score_s": score_s}
+
+
+def cross_validate_grid(
+    X: pd.DataFrame,
+    y: pd.Series,
+    param_grid: dict,
+    n_splits: int = 5,
+    workers: int = None,
+    random_state: int = 42,
+    cache_dir: str = CV_CACHE_DIR,
+) -> dict:
+    """
+    Evalúa cada configuración de la grilla con validación cruzada estratificada de `n_splits` pliegues,
+    repartiendo cada (configuración, pliegue) en un pool de procesos.
+
+    Devuelve la mejor configuración (mayor accuracy promedio; ante empate, la primera de la grilla)
+    y un reporte de tiempos y accuracy por configuración.
+    """
+    data = load_cv_data(X, y, n_splits, random_state, cache_dir)
+    configs = expand_grid(param_grid)
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=process_pool_context(),
+        initializer=_init_worker,
+        initargs=(data["X"], data["y"], data["folds"], list(X.columns)),
+    ) as pool:
+        futures = [
+            pool.submit(_fit_fold, config_index, params, fold_index, random_state)
+            for config_index, params in enumerate(configs)
+            for fold_index in range(n_splits)
+        ]
+        results = [future.result() for future in futures]
+    wall_s = time.perf_counter() - started
+
+    report = []
+    for config_index, params in enumerate(configs):
+        rows = [result for result in results if result["config"] == config_index]
+        accuracies = np.array([row["accuracy"] for row in rows])
+        report.append({
+            "params": params,
+            "mean_accuracy": float(accuracies.mean()),
+            "std_accuracy": float(accuracies.std()),
+            "mean_fit_s": float(np.mean([row["fit_s"] for row in rows])),
+            "mean_score_s": float(np.mean([row["score_s"] for row in rows])),
+            "total_s": float(sum(row["fit_s"] + row["score_s"] for row in rows)),
+        })
+
+    best = max(range(len(report)), key=lambda i: (report[i]["mean_accuracy"], -i))
+    return {
+        "best_params": configs[best],
+        "best_accuracy": report[best]["mean_accuracy"],
+        "n_splits": n_splits,
+        "workers": workers,
+        "wall_s": wall_s,
+        "configs": report,
+    }
+
+
+def print_cv_report(result: dict):
+    print(
+        f"Validación cruzada: {len(result['configs'])} configuraciones x {result['n_splits']} pliegues "
+        f"en {result['wall_s']:.1f}s con {result['workers']} procesos."
+    )
+    for row in sorted(result["configs"], key=lambda row: -row["mean_accuracy"]):
+        print(
+            f"  {row['params']}: accuracy {row['mean_accuracy']:.4f} ± {row['std_accuracy']:.4f}, "
+            f"ajuste {row['mean_fit_s'] * 1000:.0f} ms, evaluación {row['mean_score_s'] * 1000:.0f} ms, "
+            f"total {row['total_s']:.2f}s"
+        )
+    print(f"Mejor configuración: {result['best_params']} (accuracy {result['best_accuracy']:.4f}).")
+
+
+def labelled_frame(records: list, features: list, target_column: str = "HeartDisease") -> tuple:
+    """
+    Arma `(X, y, omitidos)` con los registros de solicitudes que traen la etiqueta real.
+
+    Las solicitudes llegan ya codificadas, pero si alguna trae una categoría en texto ("M", "ASY"...)
+    se codifica igual que en el bloque `preprocess`. Se omiten los registros con campos faltantes,
+    no numéricos o con una etiqueta distinta de 0/1.
+    """
+    df = pd.DataFrame.from_records(records, columns=list(features) + [target_column])
+    for column, mapping in CATEGORICAL_MAPPINGS.items():
+        if column in df.columns:
+            df[column] = df[column].map(lambda value: mapping.get(value, value) if isinstance(value, str) else value)
+    df = df.apply(pd.to_numeric, errors="coerce")
+    valid = df.notna().all(axis=1) & df[target_column].isin([0, 1])
+    df = df[valid]
+    return df[list(features)], df[target_column].astype(int), int((~valid).sum())
+
+
+def add_trees(model: RandomForestClassifier, X: pd.DataFrame, y: pd.Series, new_trees: int, max_trees: int) -> dict:
+    """
+    Agrega `new_trees` árboles ajustados solo con (X, y) usando `warm_start`; los árboles existentes
+    no se vuelven a entrenar. Si el bosque supera `max_trees`, se retiran los más antiguos.
+
+    El modelo se modifica en el lugar (pasar una copia si se quiere conservar el original).
+    """
+    if set(np.unique(y)) != set(model.classes_):
+        raise ValueError("Los registros nuevos deben traer ambas clases para agregar árboles al modelo.")
+
+    before = len(model.estimators_)
+    model.set_params(warm_start=True, n_estimators=before + new_trees)
+    model.fit(X, y)
+
+    retired = max(0, len(model.estimators_) - max_trees)
+    if retired:
+        # `estimators_` está en orden de entrenamiento: los primeros son los más antiguos
+        model.estimators_ = model.estimators_[retired:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    return {"trees_before": before, "trees_added": new_trees, "trees_retired": retired, "trees_after": len(model.estimators_)}
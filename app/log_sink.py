@@ -0,0 +1,273 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Políticas disponibles cuando la cola está llena
+FULL_POLICIES = ("block", "drop", "spill")
+
+# Marca para detener el hilo escritor
+_STOP = object()
+
+
+class PredictionLogSink:
+    """
+    Escritor en segundo plano para los logs de predicciones.
+
+    Los registros se encolan en memoria (cola acotada) y un hilo los escribe por lotes,
+    cuando se acumulan `flush_records` registros o pasan `flush_interval` segundos.
+    El formato de cada línea es el mismo que lee `etl_logs.py`: un JSON por línea.
+
+    Con la cola llena, la política por defecto `drop` descarta el registro (y lo cuenta en `dropped`)
+    sin esperar. `block` (esperar espacio) y `spill` (escribir en `predictions.log.spill`) se ejecutan
+    en el hilo que llama a `write`, que en la API es el bucle de eventos: solo conviene usarlas si
+    perder registros es peor que frenar las solicitudes mientras dura la saturación.
+    Los archivos rotados se nombran `predictions.log.AAAAMMDDHH[.n]` y `etl_logs.py` también los lee.
+    """
+
+    def __init__(
+        self,
+        log_file: str = os.path.join("logs", "api", "predictions.log"),
+        queue_size: int = 10000,
+        flush_records: int = 100,
+        flush_interval: float = 1.0,
+        max_bytes: int = 0,
+        rotate_hourly: bool = False,
+        full_policy: str = "drop",
+    ):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"Política de cola llena inválida: {full_policy}. Opciones: {FULL_POLICIES}")
+
+        self.log_file = log_file
+        self.spill_file = log_file + ".spill"
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_hourly = rotate_hourly
+        self.full_policy = full_policy
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spill_lock = threading.Lock()
+        self._spill_handle = None
+        self._file = None
+        self._file_hour = None
+        self._file_size = 0
+        self._thread = None
+        # Número de orden de cada registro: los derramados a disco se intercalan con los de la cola
+        # en el orden en que llegaron. Empieza en el reloj para quedar después de un .spill de una corrida anterior
+        self._sequence = itertools.count(time.time_ns())
+
+        # Contadores
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.errors = 0
+        self.flushes = 0
+        self.rotations = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prediction-log-sink", daemon=True)
+            self._thread.start()
+        return self
+
+    def write(self, record: dict):
+        """
+        Encola un registro. Solo si la cola está llena, `block` y `spill` hacen esperar al hilo que llama.
+        """
+        self.enqueued += 1
+        item = (next(self._sequence), record)
+        if self.full_policy == "block":
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.full_policy == "drop":
+                self.dropped += 1
+            else:
+                self._spill(item)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Vacía la cola, escribe los registros pendientes y detiene el hilo escritor.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "errors": self.errors,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "queue_depth": self._queue.qsize(),
+        }
+
+    def _spill(self, item: tuple):
+        # Con la cola llena, el registro va a un archivo auxiliar (abierto una sola vez) que el hilo escritor
+        # recupera después; cada línea lleva su número de orden: "<n>\t<json>"
+        sequence, record = item
+        try:
+            line = f"{sequence}\t{json.dumps(record)}\n"
+        except (TypeError, ValueError):
+            self.errors += 1
+            return
+        with self._spill_lock:
+            if self._spill_handle is None:
+                os.makedirs(os.path.dirname(self.spill_file) or ".", exist_ok=True)
+                self._spill_handle = open(self.spill_file, "a")
+            self._spill_handle.write(line)
+        self.spilled += 1
+
+    def _run(self):
+        buffer = []
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    buffer.append(item)
+            except queue.Empty:
+                pass
+
+            if stopping or len(buffer) >= self.flush_records or time.monotonic() - last_flush >= self.flush_interval:
+                # Al detenerse se drena todo lo que quede en la cola. Si hay registros derramados también:
+                # los que estaban en la cola cuando se derramaron son anteriores y deben escribirse antes
+                spilled = self._take_spill()
+                while stopping or spilled:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                    else:
+                        buffer.append(item)
+                try:
+                    self._flush(buffer, spilled)
+                except Exception as e:
+                    self.errors += len(buffer) + len(spilled)
+                    print(f"Error al escribir los logs de predicciones: {e}")
+                buffer = []
+                last_flush = time.monotonic()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _flush(self, buffer, spilled=()):
+        # Lo derramado a disco y lo que venía en la cola se intercalan por número de orden: un registro
+        # derramado es posterior a los que ya estaban en la cola, pero anterior a los que entraron después
+        numbered = list(spilled)
+        for sequence, record in buffer:
+            try:
+                numbered.append((sequence, json.dumps(record) + "\n"))
+            except (TypeError, ValueError) as e:
+                # Un registro no serializable no debe descartar el resto del lote
+                self.errors += 1
+                print(f"Error al serializar un log de predicción: {e}")
+        if not numbered:
+            return
+        numbered.sort(key=lambda entry: entry[0])
+        lines = [line for _, line in numbered]
+
+        chunk = []
+        for line in lines:
+            if self._needs_rotation(len(line)):
+                self._write(chunk)
+                chunk = []
+                self._rotate()
+            chunk.append(line)
+            self._file_size += len(line)
+        self._write(chunk)
+
+        self.written += len(lines)
+        self.flushes += 1
+
+    def _write(self, chunk):
+        if not chunk:
+            return
+        self._open()
+        self._file.write("".join(chunk))
+        self._file.flush()
+
+    def _open(self):
+        if self._file is not None:
+            return
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        if os.path.exists(self.log_file):
+            self._file_size = os.path.getsize(self.log_file)
+            self._file_hour = datetime.fromtimestamp(os.path.getmtime(self.log_file)).strftime("%Y%m%d%H")
+        else:
+            self._file_size = 0
+            self._file_hour = datetime.now().strftime("%Y%m%d%H")
+        self._file = open(self.log_file, "a")
+
+    def _take_spill(self) -> list:
+        with self._spill_lock:
+            if self._spill_handle is not None:
+                self._spill_handle.close()
+                self._spill_handle = None
+            if not os.path.exists(self.spill_file):
+                return []
+            with open(self.spill_file, "r") as f:
+                lines = f.readlines()
+            os.remove(self.spill_file)
+        numbered = []
+        for line in lines:
+            sequence, tab, payload = line.partition("\t")
+            # Las líneas sin número de orden (de versiones anteriores) son las más antiguas
+            numbered.append((int(sequence), payload) if tab and sequence.isdigit() else (0, line))
+        return numbered
+
+    def _needs_rotation(self, incoming_bytes: int) -> bool:
+        self._open()
+        if self._file_size == 0:
+            return False
+        by_hour = self.rotate_hourly and self._file_hour != datetime.now().strftime("%Y%m%d%H")
+        by_size = self.max_bytes > 0 and self._file_size + incoming_bytes > self.max_bytes
+        return by_hour or by_size
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        # Los archivos rotados conservan la hora de sus registros: predictions.log.AAAAMMDDHH[.n]
+        rotated = f"{self.log_file}.{self._file_hour}"
+        n = 1
+        while os.path.exists(rotated):
+            rotated = f"{self.log_file}.{self._file_hour}.{n}"
+            n += 1
+        os.rename(self.log_file, rotated)
+        self.rotations += 1
+        self._open()
+
+
+def sink_from_env() -> PredictionLogSink:
+    """
+    Crea el escritor de logs con la configuración de las variables de entorno.
+    """
+    return PredictionLogSink(
+        log_file=os.getenv("PREDICTION_LOG_FILE", os.path.join("logs", "api", "predictions.log")),
+        queue_size=int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "10000")),
+        flush_records=int(os.getenv("PREDICTION_LOG_FLUSH_RECORDS", "100")),
+        flush_interval=float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL_S", "1.0")),
+        max_bytes=int(os.getenv("PREDICTION_LOG_MAX_BYTES", "0")),
+        rotate_hourly=os.getenv("PREDICTION_LOG_ROTATE_HOURLY", "0").lower() in ("1", "true", "yes"),
+        full_policy=os.getenv("PREDICTION_LOG_FULL_POLICY", "drop"),
+    )
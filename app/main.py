@@ -1,9 +1,14 @@
 import pandas as pd
+import numpy as np
 import os
+import sys
+import time
 from datetime import datetime
 import json
 from pydantic import BaseModel, ValidationError
-from typing import Literal
+from typing import Literal, get_args, get_origin
+from heart_failure_project.utils.encoding import CATEGORICAL_MAPPINGS, CATEGORY_LEVELS, CATEGORY_CODES
+from process_log_store import parquet_sink_from_env, partition_dir
 
 # Ruta al dataset CSV
 CSV_PATH = os.path.join("data", "heart.csv")
@@ -22,14 +27,17 @@ class PredictionInput(BaseModel):
     Oldpeak: float
     ST_Slope: Literal["Up", "Flat", "Down"]
 
-# Mapeos para las variables categóricas
-categorical_mappings = {
-    "Sex": {"M": 1, "F": 0},
-    "ChestPainType": {"TA": 0, "ATA": 1, "NAP": 2, "ASY": 3},
-    "RestingECG": {"Normal": 0, "ST": 1, "LVH": 2},
-    "ExerciseAngina": {"Y": 1, "N": 0},
-    "ST_Slope": {"Up": 0, "Flat": 1, "Down": 2},
-}
+# Escritor opcional de logs en Parquet (PROCESS_LOG_FORMAT=parquet); por defecto se escriben en JSON
+process_log_sink = parquet_sink_from_env()
+
+# Particiones de logs JSON ya creadas en este proceso (evita os.makedirs en cada registro)
+created_log_dirs = set()
+
+# Mapeos para las variables categóricas (compartidos con el bloque `preprocess` del entrenamiento)
+categorical_mappings = CATEGORICAL_MAPPINGS
+
+# Tipo de cada campo del esquema, para validar columnas completas en `process_batch`
+FIELD_TYPES = dict(PredictionInput.__annotations__)
 
 # Función para cargar datos desde un archivo CSV
 def load_data(file_path: str):
@@ -90,30 +98,89 @@ def process_data(data: dict) -> dict:
         print(error_message)
         return {"status": "error", "message": error_message}
 
+# Función para validar y preprocesar un lote completo de datos
+def process_batch(data: pd.DataFrame) -> dict:
+    """
+    Valida y codifica todas las filas de un DataFrame con operaciones por columna, con los mismos
+    dominios que `PredictionInput` (valores `Literal`, enteros y flotantes).
+
+    Devuelve las filas válidas ya codificadas (con su índice original) y, en `invalid_rows`,
+    los errores de cada fila inválida por índice.
+    """
+    try:
+        missing = [field for field in FIELD_TYPES if field not in data.columns]
+        if missing:
+            raise ValueError(f"Faltan las columnas necesarias: {missing}")
+
+        valid = np.ones(len(data), dtype=bool)
+        invalid_rows = {}
+        encoded = {}
+
+        def reject(field, mask, message):
+            # Solo se recorre la lista de filas inválidas para armar los mensajes
+            valid[mask] = False
+            for i in np.flatnonzero(mask):
+                invalid_rows.setdefault(data.index[i], []).append(f"{field}: {message}")
+
+        for field, annotation in FIELD_TYPES.items():
+            column = data[field]
+            if get_origin(annotation) is Literal and field in CATEGORY_LEVELS:
+                # Códigos precalculados: posición de la categoría -> código del modelo
+                positions = pd.Categorical(column, categories=CATEGORY_LEVELS[field]).codes
+                bad = positions < 0
+                reject(field, bad, f"debe ser uno de {list(get_args(annotation))}")
+                encoded[field] = CATEGORY_CODES[field][np.where(bad, 0, positions)]
+            elif get_origin(annotation) is Literal:
+                values = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64)
+                bad = ~np.isin(values, get_args(annotation))
+                reject(field, bad, f"debe ser uno de {list(get_args(annotation))}")
+                encoded[field] = np.where(bad, 0, values).astype(np.int64)
+            else:
+                values = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64)
+                bad = ~np.isfinite(values)
+                if annotation is int:
+                    bad |= values != np.trunc(values)
+                reject(field, bad, f"debe ser un número {'entero' if annotation is int else 'válido'}")
+                encoded[field] = np.where(bad, 0, values).astype(np.int64 if annotation is int else np.float64)
+
+        processed = pd.DataFrame(encoded, index=data.index)[valid]
+        status = "success" if not invalid_rows else "partial"
+
+        # Un solo log por lote con el resumen
+        log_request_response(
+            {"rows": len(data)},
+            {"status": status, "valid_rows": int(valid.sum()), "invalid_rows": [str(i) for i in invalid_rows]},
+        )
+
+        return {"status": status, "data": processed, "invalid_rows": invalid_rows}
+    except Exception as e:
+        error_message = f"Error al procesar el lote: {str(e)}"
+        print(error_message)
+        return {"status": "error", "message": error_message}
+
 # Función para generar logs
 def log_request_response(request_data, response_data):
     try:
-        log_dir = os.path.join("logs", "process")
-        os.makedirs(log_dir, exist_ok=True)
-
-        # Generar ruta del archivo log
         now = datetime.now()
-        file_path = os.path.join(
-            log_dir,
-            f"year={now.year}",
-            f"month={now.month:02d}",
-            f"day={now.day:02d}",
-            f"hour={now.hour:02d}"
-        )
-        os.makedirs(file_path, exist_ok=True)
-        log_file = os.path.join(file_path, "log.json")
-
-        # Escribir el log
         log_entry = {
             "timestamp": now.isoformat(),
             "request": request_data,
             "response": response_data
         }
+
+        # Logs en Parquet: se acumulan y se escriben por lotes en la misma partición por hora
+        if process_log_sink is not None:
+            process_log_sink.write(log_entry)
+            return
+
+        # Generar ruta del archivo log
+        file_path = partition_dir(os.path.join("logs", "process"), now)
+        if file_path not in created_log_dirs:
+            os.makedirs(file_path, exist_ok=True)
+            created_log_dirs.add(file_path)
+        log_file = os.path.join(file_path, "log.json")
+
+        # Escribir el log
         with open(log_file, "a") as f:
             f.write(json.dumps(log_entry) + "\n")
     except Exception as log_error:
@@ -125,11 +192,24 @@ if __name__ == "__main__":
         # Cargar datos desde el CSV
         data = load_data(CSV_PATH)
 
-        # Seleccionar una muestra aleatoria
-        sample_data = get_sample(data)
-
-        # Validar y preprocesar la muestra
-        result = process_data(sample_data)
-        print(f"Resultado: {result}")
+        if "--batch" in sys.argv:
+            # Validar y preprocesar el dataset completo de una vez
+            started = time.perf_counter()
+            result = process_batch(data)
+            elapsed = time.perf_counter() - started
+            if result["status"] == "error":
+                print(f"Resultado: {result}")
+            else:
+                print(
+                    f"Lote procesado: {len(result['data'])} filas válidas, {len(result['invalid_rows'])} inválidas "
+                    f"en {elapsed * 1000:.1f} ms ({len(data) / elapsed:.0f} filas/s)."
+                )
+        else:
+            # Seleccionar una muestra aleatoria
+            sample_data = get_sample(data)
+
+            # Validar y preprocesar la muestra
+            result = process_data(sample_data)
+            print(f"Resultado: {result}")
     except Exception as e:
-        print(f"Error en la ejecución: {e}")
\ No newline at end of file
+        print(f"Error en la ejecución: {e}")
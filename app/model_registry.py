@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from forest_engine import CompiledForest
+from heart_failure_project.utils.forest_artifact import METADATA_FILE, file_version
+
+
+class LoadedModel:
+    """
+    Un modelo listo para servir: su motor compilado, su versión y, si se cargó con joblib,
+    el estimador de sklearn (None cuando viene del artefacto mapeado en memoria).
+    """
+
+    def __init__(self, model, engine: CompiledForest, version: str, path: str, signature: str):
+        self.model = model
+        self.engine = engine
+        self.version = version
+        self.path = path
+        self.signature = signature
+        self.loaded_at = datetime.now().isoformat()
+
+    @property
+    def feature_names(self) -> list:
+        return list(self.engine.feature_names_in_)
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "format": "joblib" if self.model is not None else "mmap",
+            "loaded_at": self.loaded_at,
+            "n_estimators": self.engine.n_estimators,
+        }
+
+
+def file_signature(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class ModelRegistry:
+    """
+    Mantiene el modelo activo y el anterior en memoria.
+
+    Los modelos nuevos se cargan y se calientan fuera del camino de las solicitudes; luego se
+    reemplazan con una sola asignación (atómica), así las solicitudes en curso terminan con el
+    modelo que ya tenían. `rollback` vuelve al modelo anterior sin leer el disco.
+
+    Con `artifact_dir`, el modelo se carga del artefacto compacto (arreglos .npy mapeados en
+    memoria) en lugar de deserializar el archivo joblib en cada worker.
+    """
+
+    def __init__(self, model_path: str, artifact_dir: str = None):
+        self.model_path = model_path
+        self.artifact_dir = artifact_dir
+        self.current = None
+        self.previous = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._listeners = []
+        # Última firma del archivo ya procesada: tras un rollback no se vuelve a cargar el mismo archivo
+        self._seen_signature = None
+
+        # Contadores
+        self.reloads = 0
+        self.rollbacks = 0
+        self.failed_reloads = 0
+
+    def on_swap(self, listener):
+        """
+        Registra una función que se llama con el nuevo `LoadedModel` después de cada cambio.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def watch_path(self) -> str:
+        """
+        Archivo que indica que hay un modelo nuevo: el metadata.json del artefacto (se escribe al final) o el joblib.
+        """
+        if self.artifact_dir:
+            return os.path.join(self.artifact_dir, METADATA_FILE)
+        return self.model_path
+
+    def load(self, path: str = None) -> LoadedModel:
+        """
+        Carga un modelo desde disco, lo compila y hace una predicción de calentamiento.
+        """
+        if self.artifact_dir and path is None:
+            loaded = self._load_artifact(self.artifact_dir)
+        else:
+            loaded = self._load_joblib(path or self.model_path)
+
+        # Predicción de calentamiento para no pagar el primer uso dentro de una solicitud
+        loaded.engine.predict(np.zeros((1, loaded.engine.n_features_in_)))
+
+        if self.current is not None and loaded.feature_names != self.current.feature_names:
+            raise ValueError(
+                f"El modelo {loaded.version} espera columnas distintas al modelo activo: {loaded.feature_names}"
+            )
+        return loaded
+
+    def _load_joblib(self, path: str) -> LoadedModel:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No se encontró el modelo en {path}. Por favor, entrena el modelo primero.")
+
+        signature = file_signature(path)
+        version = file_version(path)
+        model = joblib.load(path)
+        engine = CompiledForest.from_sklearn(model)
+        return LoadedModel(model, engine, version, path, signature)
+
+    def _load_artifact(self, directory: str) -> LoadedModel:
+        # El artefacto es un enlace a su versión actual: se resuelve una vez para leer todo de la misma
+        directory = os.path.realpath(directory)
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        if not os.path.exists(metadata_path):
+            raise FileNotFoundError(f"No se encontró el artefacto del modelo en {directory}. Por favor, entrena el modelo primero.")
+
+        signature = file_signature(metadata_path)
+        engine = CompiledForest.from_artifact(directory, mmap_mode="r")
+        with open(metadata_path, "r") as f:
+            version = json.load(f)["version"]
+        return LoadedModel(None, engine, version, directory, signature)
+
+    def reload(self, path: str = None) -> dict:
+        """
+        Carga el modelo del disco y, si es una versión distinta, lo activa.
+        """
+        with self._lock:
+            try:
+                loaded = self.load(path)
+            except Exception:
+                self.failed_reloads += 1
+                # No reintentar el mismo archivo defectuoso hasta que vuelva a cambiar
+                if path is None and os.path.exists(self.watch_path):
+                    self._seen_signature = file_signature(self.watch_path)
+                raise
+            self._seen_signature = loaded.signature
+            if self.current is not None and loaded.version == self.current.version:
+                return {"status": "unchanged", "model": self.current.info()}
+            self._swap(loaded)
+            self.reloads += 1
+            return {"status": "reloaded", "model": self.current.info()}
+
+    def rollback(self) -> dict:
+        """
+        Vuelve al modelo anterior que se conserva en memoria.
+        """
+        with self._lock:
+            if self.previous is None:
+                raise ValueError("No hay un modelo anterior en memoria para revertir.")
+            self._swap(self.previous)
+            self.rollbacks += 1
+            return {"status": "rolled_back", "model": self.current.info()}
+
+    def activate(self, loaded: LoadedModel):
+        """
+        Activa el primer modelo cargado al iniciar la API.
+        """
+        self._seen_signature = loaded.signature
+        self.current = loaded
+
+    def _swap(self, loaded: LoadedModel):
+        self.previous, self.current = self.current, loaded
+        for listener in self._listeners:
+            listener(loaded)
+
+    def start_watcher(self, interval: float):
+        """
+        Revisa el archivo del modelo cada `interval` segundos y recarga si cambió.
+        """
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(5)
+            self._watcher = None
+
+    def _watch(self, interval: float):
+        pending_signature = None
+        while not self._stop.wait(interval):
+            try:
+                signature = file_signature(self.watch_path)
+            except OSError:
+                continue
+            if signature == self._seen_signature:
+                pending_signature = None
+                continue
+            # Esperar a que la firma se mantenga entre dos revisiones: el entrenamiento puede seguir escribiendo
+            if signature != pending_signature:
+                pending_signature = signature
+                continue
+            started = time.perf_counter()
+            try:
+                result = self.reload()
+                print(f"Modelo recargado ({result['status']}): {result['model']['version']} en {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"Error al recargar el modelo: {e}")
+            pending_signature = None
+
+    def info(self) -> dict:
+        return {
+            "watch_path": self.watch_path,
+            "current": self.current.info() if self.current else None,
+            "previous": self.previous.info() if self.previous else None,
+            "reloads": self.reloads,
+            "rollbacks": self.rollbacks,
+            "failed_reloads": self.failed_reloads,
+        }
+
+
+def registry_from_env(model_path: str) -> ModelRegistry:
+    """
+    Crea el registro según MODEL_FORMAT: `joblib` (por defecto) o `mmap`, que usa el artefacto
+    compacto de MODEL_ARTIFACT_DIR y vuelve a joblib si el artefacto todavía no existe.
+    """
+    if os.getenv("MODEL_FORMAT", "joblib").lower() != "mmap":
+        return ModelRegistry(model_path)
+
+    artifact_dir = os.getenv("MODEL_ARTIFACT_DIR", os.path.join("models", "compiled_model"))
+    if not os.path.exists(os.path.join(artifact_dir, METADATA_FILE)):
+        print(f"No se encontró el artefacto en {artifact_dir}; se usará {model_path}.")
+        return ModelRegistry(model_path)
+    return ModelRegistry(model_path, artifact_dir=artifact_dir)
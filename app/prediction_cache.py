@@ -0,0 +1,172 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Costo aproximado en memoria de cada entrada (llave, valor, tupla y nodo del OrderedDict)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """
+    Caché LRU en memoria de predicciones por fila, con TTL y un presupuesto de memoria.
+
+    La llave es un hash de los valores de `EXPECTED_FEATURES` (en orden, como float64) junto con
+    la versión del modelo. Si el archivo del modelo cambia (mtime y tamaño) o el registro activa otra
+    versión, la caché se invalida sola.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        max_entries: int = 100000,
+        ttl: float = 3600.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        check_interval: float = 1.0,
+        model_version: str = None,
+    ):
+        self.model_path = model_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # La invalidación puede llegar desde el hilo que recarga el modelo
+        self._lock = threading.Lock()
+        self._model_signature = self._read_signature()
+        self._last_check = time.monotonic()
+        self.model_version = model_version or self._model_signature
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _read_signature(self) -> str:
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return "unknown"
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def _check_model(self):
+        # Revisar el archivo del modelo como máximo una vez por `check_interval` segundos
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        signature = self._read_signature()
+        if signature != self._model_signature:
+            self._model_signature = signature
+            self.set_model_version(signature)
+
+    def set_model_version(self, version: str):
+        """
+        Cambia la versión del modelo usada en las llaves y descarta las entradas anteriores.
+        """
+        if version == self.model_version:
+            return
+        self.model_version = version
+        self.clear()
+        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def keys_for(self, X: np.ndarray) -> list:
+        """
+        Calcula la llave canónica de cada fila de la matriz de características.
+        """
+        self._check_model()
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        version = self.model_version.encode("utf-8")
+        return [hashlib.blake2b(row.tobytes() + version, digest_size=16).digest() for row in X]
+
+    def lookup(self, keys: list):
+        """
+        Devuelve la lista de valores en caché (None si no está) y los índices de las filas faltantes.
+        """
+        now = time.monotonic()
+        values = [None] * len(keys)
+        missing = []
+        with self._lock:
+            self._lookup(keys, now, values, missing)
+        return values, missing
+
+    def _lookup(self, keys, now, values, missing):
+        for i, key in enumerate(keys):
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                missing.append(i)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                values[i] = entry[0]
+
+    def store(self, keys: list, values):
+        with self._lock:
+            self._store(keys, values)
+
+    def _store(self, keys, values):
+        expires_at = time.monotonic() + self.ttl
+        for key, value in zip(keys, values):
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self._bytes += len(key) + ENTRY_OVERHEAD_BYTES
+
+        # Expulsar las entradas menos usadas hasta respetar los límites
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._bytes -= len(key) + ENTRY_OVERHEAD_BYTES
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model_version": self.model_version,
+            "entries": len(self._entries),
+            "approx_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def cache_from_env(model_path: str, model_version: str = None):
+    """
+    Crea la caché solo si está habilitada con PREDICTION_CACHE=1 (desactivada por defecto).
+    """
+    if os.getenv("PREDICTION_CACHE", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return PredictionCache(
+        model_path,
+        max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "100000")),
+        ttl=float(os.getenv("PREDICTION_CACHE_TTL_S", "3600")),
+        max_bytes=int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        model_version=model_version,
+    )
@@ -0,0 +1,306 @@
+"""
+Logs de procesamiento de main.py en Parquet con la misma partición tipo hive que los JSON:
+logs/process/year=AAAA/month=MM/day=DD/hour=HH/.
+
+Incluye el escritor con búfer, la compactación de los archivos pequeños de cada hora y un lector
+que solo abre las particiones del rango de tiempo pedido.
+
+Uso (desde el directorio de la API):
+    python -m process_log_store compact
+    python -m process_log_store read --start 2024-11-16T00:00 --end 2024-11-17T00:00
+"""
+import argparse
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# pyarrow es opcional: sin él, main.py sigue escribiendo los logs en JSON
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+LOG_DIR = os.path.join("logs", "process")
+JSON_LOG_FILE = "log.json"
+
+# Metadato de un archivo compactado con los nombres de los archivos que reemplaza
+COMPACTED_FROM_KEY = b"compacted_from"
+
+
+def partition_dir(base_dir: str, ts: datetime) -> str:
+    return os.path.join(
+        base_dir,
+        f"year={ts.year}",
+        f"month={ts.month:02d}",
+        f"day={ts.day:02d}",
+        f"hour={ts.hour:02d}",
+    )
+
+
+def _to_table(records: list):
+    """
+    Una fila por registro: timestamp, estado, solicitud y respuesta en JSON, y una columna
+    `request_<campo>` por cada campo escalar de la solicitud (para filtrar sin parsear JSON).
+    """
+    df = pd.DataFrame({
+        "timestamp": pd.to_datetime([record["timestamp"] for record in records]),
+        "status": [
+            record["response"].get("status") if isinstance(record["response"], dict) else None
+            for record in records
+        ],
+        "request_json": [json.dumps(record["request"]) for record in records],
+        "response_json": [json.dumps(record["response"]) for record in records],
+    })
+    fields = {}
+    for i, record in enumerate(records):
+        if isinstance(record["request"], dict):
+            for key, value in record["request"].items():
+                if value is None or isinstance(value, (bool, int, float, str)):
+                    fields.setdefault(key, [None] * len(records))[i] = value
+    for key, values in fields.items():
+        column = pd.Series(values)
+        if column.dtype == object and len({type(v) for v in values if v is not None}) > 1:
+            # Tipos mezclados en un mismo campo: se guarda como texto
+            column = column.map(lambda v: None if v is None else str(v))
+        df[f"request_{key}"] = column
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_table(table, directory: str, prefix: str, metadata: dict = None) -> str:
+    """
+    Escribe en un archivo temporal y lo renombra, para que el lector nunca vea un Parquet a medias.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    name = f"{prefix}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    path = os.path.join(directory, name)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class ParquetLogSink:
+    """
+    Acumula los logs en memoria y los escribe como un archivo Parquet por partición de hora.
+
+    Se escribe al juntar `flush_records` registros, cuando el registro más antiguo del búfer
+    supera `flush_interval` segundos (revisado en cada escritura) y al terminar el proceso.
+    """
+
+    def __init__(self, base_dir: str = LOG_DIR, flush_records: int = 1000, flush_interval: float = 60.0):
+        if pa is None:
+            raise ImportError("pyarrow no está instalado; no se pueden escribir logs en Parquet.")
+        self.base_dir = base_dir
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.written = 0
+        self.files = 0
+
+    def write(self, record: dict):
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(record)
+            if len(self._buffer) >= self.flush_records or time.monotonic() - self._oldest >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+
+        # Un archivo por partición de hora
+        partitions = {}
+        for record in buffer:
+            ts = datetime.fromisoformat(record["timestamp"])
+            partitions.setdefault(partition_dir(self.base_dir, ts), []).append(record)
+        for directory, records in partitions.items():
+            _write_table(_to_table(records), directory, "part")
+            self.files += 1
+        self.written += len(buffer)
+
+    def close(self):
+        self.flush()
+
+
+def parquet_sink_from_env():
+    """
+    Crea el escritor Parquet solo si PROCESS_LOG_FORMAT=parquet (por defecto los logs siguen en JSON).
+    """
+    if os.getenv("PROCESS_LOG_FORMAT", "json").lower() != "parquet":
+        return None
+    if pa is None:
+        print("PROCESS_LOG_FORMAT=parquet requiere pyarrow; se usarán logs en JSON.")
+        return None
+    sink = ParquetLogSink(
+        base_dir=os.getenv("PROCESS_LOG_DIR", LOG_DIR),
+        flush_records=int(os.getenv("PROCESS_LOG_FLUSH_RECORDS", "1000")),
+        flush_interval=float(os.getenv("PROCESS_LOG_FLUSH_INTERVAL_S", "60")),
+    )
+    atexit.register(sink.close)
+    return sink
+
+
+def _concat(tables: list):
+    """
+    Une tablas con columnas distintas; si un campo tiene tipos incompatibles entre archivos
+    (por ejemplo, número en uno y texto en otro) se une como texto.
+    """
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        types = {}
+        for table in tables:
+            for field in table.schema:
+                if not pa.types.is_null(field.type):
+                    types.setdefault(field.name, set()).add(field.type)
+        conflicting = {name for name, found in types.items() if len(found) > 1}
+        tables = [
+            table.cast(pa.schema([
+                pa.field(field.name, pa.string()) if field.name in conflicting else field for field in table.schema
+            ]))
+            for table in tables
+        ]
+        return pa.concat_tables(tables, promote_options="permissive")
+
+
+def _compacted_sources(path: str) -> list:
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata.get(COMPACTED_FROM_KEY, b"[]"))
+
+
+def _live_files(directory: str) -> list:
+    """
+    Archivos Parquet vigentes de una partición: si un archivo compactado reemplaza a otros que
+    todavía existen (la compactación se interrumpió antes de borrarlos), esos se ignoran.
+    """
+    files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+    replaced = set()
+    for path in files:
+        if os.path.basename(path).startswith("compacted-"):
+            replaced.update(_compacted_sources(path))
+    return [path for path in files if os.path.basename(path) not in replaced]
+
+
+def compact_partitions(base_dir: str = LOG_DIR, min_files: int = 2, include_current_hour: bool = False) -> dict:
+    """
+    Une los archivos Parquet pequeños de cada partición de hora en uno solo.
+
+    Por defecto no toca la hora en curso, que todavía recibe archivos nuevos.
+    """
+    current = partition_dir(base_dir, datetime.now())
+    started = time.perf_counter()
+    report = {"partitions": 0, "files_in": 0, "bytes_in": 0, "bytes_out": 0}
+    for directory in sorted(glob.glob(os.path.join(base_dir, "year=*", "month=*", "day=*", "hour=*"))):
+        if directory == current and not include_current_hour:
+            continue
+
+        # Terminar una compactación anterior interrumpida: borrar los archivos ya reemplazados
+        files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+        live = _live_files(directory)
+        for path in set(files) - set(live):
+            os.remove(path)
+        for path in glob.glob(os.path.join(directory, "*.parquet.tmp")):
+            os.remove(path)
+
+        if len(live) < min_files:
+            continue
+        tables = [pq.read_table(path) for path in live]
+        merged = _concat(tables).sort_by("timestamp")
+        sources = [os.path.basename(path) for path in live]
+        _write_table(merged, directory, "compacted", {COMPACTED_FROM_KEY: json.dumps(sources).encode("utf-8")})
+        for path in live:
+            report["bytes_in"] += os.path.getsize(path)
+            os.remove(path)
+
+        report["partitions"] += 1
+        report["files_in"] += len(live)
+        report["bytes_out"] += sum(os.path.getsize(path) for path in _live_files(directory))
+
+    report["elapsed_s"] = time.perf_counter() - started
+    return report
+
+
+def _hours_in_range(start: datetime, end: datetime):
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    while hour < end:
+        yield hour
+        hour += timedelta(hours=1)
+
+
+def _read_json_log(path: str):
+    with open(path, "r") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return _to_table(records) if records else None
+
+
+def read_process_logs(start: datetime, end: datetime, base_dir: str = LOG_DIR, columns: list = None) -> pd.DataFrame:
+    """
+    Lee los logs con timestamp en [start, end). Solo se abren las particiones de hora del rango;
+    también se leen los log.json de las horas en que el escritor Parquet no estaba activo.
+    """
+    if pa is None:
+        raise ImportError("pyarrow no está instalado; no se pueden leer logs en Parquet.")
+    tables = []
+    for hour in _hours_in_range(start, end):
+        directory = partition_dir(base_dir, hour)
+        if not os.path.isdir(directory):
+            continue
+        for path in _live_files(directory):
+            tables.append(pq.read_table(path))
+        json_path = os.path.join(directory, JSON_LOG_FILE)
+        if os.path.exists(json_path):
+            table = _read_json_log(json_path)
+            if table is not None:
+                tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=columns or ["timestamp", "status", "request_json", "response_json"])
+    df = _concat(tables).to_pandas()
+    df = df[(df["timestamp"] >= pd.Timestamp(start)) & (df["timestamp"] < pd.Timestamp(end))]
+    if columns:
+        df = df[columns]
+    return df.sort_values("timestamp").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta o lee los logs de procesamiento en Parquet.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="Une los archivos pequeños de cada hora.")
+    compact_parser.add_argument("--base-dir", default=LOG_DIR)
+    compact_parser.add_argument("--include-current-hour", action="store_true")
+    read_parser = subparsers.add_parser("read", help="Lee los logs de un rango de tiempo.")
+    read_parser.add_argument("--base-dir", default=LOG_DIR)
+    read_parser.add_argument("--start", required=True, type=datetime.fromisoformat)
+    read_parser.add_argument("--end", required=True, type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        report = compact_partitions(args.base_dir, include_current_hour=args.include_current_hour)
+        print(
+            f"Compactadas {report['partitions']} particiones ({report['files_in']} archivos): "
+            f"{report['bytes_in'] / 1024:.1f} KB -> {report['bytes_out'] / 1024:.1f} KB en {report['elapsed_s']:.2f}s."
+        )
+    else:
+        logs = read_process_logs(args.start, args.end, args.base_dir)
+        print(f"Se leyeron {len(logs)} logs entre {args.start} y {args.end}.")
+        print(logs.head())
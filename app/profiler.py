@@ -0,0 +1,184 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Hojas de pila de hilos que solo esperan (el bucle de eventos sin trabajo, hilos del pool o del
+# escritor de logs bloqueados): se descartan para que el perfil muestre solo tiempo de trabajo
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo para solicitudes en producción.
+
+    Mientras hay una sesión activa, un hilo toma cada `interval` segundos la pila de todos los
+    hilos (`sys._current_frames()`), pero solo si en ese momento se está atendiendo alguna solicitud
+    elegida para perfilar (una fracción `rate` de ellas). Las pilas se acumulan en formato colapsado
+    (`hilo;marco;marco... muestras`), el que leen flamegraph.pl y speedscope. Fuera de una sesión no
+    hay hilo de muestreo y el middleware solo compara `rate` con cero.
+
+    Con solicitudes concurrentes, las muestras tomadas mientras hay una elegida en curso pueden
+    incluir trabajo de otras solicitudes que comparten el proceso.
+    """
+
+    def __init__(self, interval: float = 0.01, max_stacks: int = 10000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+
+        # Fracción de solicitudes a perfilar; 0 fuera de una sesión
+        self.rate = 0.0
+        self.until = None
+        self._active = 0
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Contadores
+        self.sessions = 0
+        self.profiled_requests = 0
+        self.samples = 0
+        self.dropped_samples = 0
+
+    def start(self, rate: float = 1.0, duration: float = None) -> dict:
+        """
+        Inicia (o reemplaza) una sesión: perfila una fracción `rate` de las solicitudes, durante
+        `duration` segundos o hasta llamar a `stop()`.
+        """
+        if not 0 < rate <= 1:
+            raise ValueError(f"La fracción de solicitudes debe estar en (0, 1]; se recibió {rate}.")
+        if duration is not None and duration <= 0:
+            raise ValueError(f"La duración debe ser mayor que cero; se recibió {duration}.")
+        self.stop()
+        self.until = time.monotonic() + duration if duration else None
+        self.rate = rate
+        self.sessions += 1
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self.stats()
+
+    def stop(self) -> dict:
+        self.rate = 0.0
+        self.until = None
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        return self.stats()
+
+    def enter(self):
+        self._active += 1
+        self.profiled_requests += 1
+
+    def exit(self):
+        self._active -= 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.until is not None and time.monotonic() >= self.until:
+                # Fin de la sesión por duración: se deja de elegir solicitudes
+                self.rate = 0.0
+                self.until = None
+                return
+            if self._active > 0:
+                self._sample(own_id)
+
+    def _sample(self, own_id: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            # Los hilos del pool se llaman asyncio_0, asyncio_1...: se agrupan bajo un mismo nombre
+            thread_name = re.sub(r"_\d+$", "", names.get(thread_id, str(thread_id)))
+            stacks.append(";".join([thread_name] + frames[::-1]))
+
+        with self._lock:
+            for stack in stacks:
+                if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                    self._stacks[stack] += 1
+                    self.samples += 1
+                else:
+                    self.dropped_samples += 1
+
+    def collapsed(self, reset: bool = False) -> str:
+        """
+        Devuelve las pilas acumuladas en formato colapsado, de la más frecuente a la menos.
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+            if reset:
+                self._stacks = Counter()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.rate > 0,
+            "rate": self.rate,
+            "remaining_s": max(self.until - time.monotonic(), 0.0) if self.until is not None else None,
+            "interval_ms": self.interval * 1000,
+            "sessions": self.sessions,
+            "profiled_requests": self.profiled_requests,
+            "samples": self.samples,
+            "dropped_samples": self.dropped_samples,
+            "stacks": len(self._stacks),
+        }
+
+
+def frame_label(code) -> str:
+    # Se usa la primera línea de la función (no la línea actual) para que cada función sea un solo marco
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfilerMiddleware:
+    """
+    Middleware ASGI que elige al azar una fracción `profiler.rate` de las solicitudes HTTP y marca
+    el intervalo en que se atienden, para que el hilo de muestreo tome pilas solo durante ese tiempo.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        rate = self.profiler.rate
+        if not rate or scope["type"] != "http" or scope["path"].startswith("/admin") or random.random() >= rate:
+            await self.app(scope, receive, send)
+            return
+
+        self.profiler.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.exit()
+
+
+def profiler_from_env():
+    """
+    Crea el perfilador solo si está habilitado con PROFILING=1 (desactivado por defecto). Sin
+    PROFILING no se agrega el middleware, así que el camino de las solicitudes no cambia.
+    """
+    if os.getenv("PROFILING", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return SamplingProfiler(
+        interval=float(os.getenv("PROFILING_INTERVAL_MS", "10")) / 1000,
+        max_stacks=int(os.getenv("PROFILING_MAX_STACKS", "10000")),
+    )
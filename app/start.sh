@@ -1,12 +1,46 @@
 #!/bin/bash
 
+# Espera hasta que `url` responda (con `--ok`, solo un código 2xx) o hasta `timeout` segundos.
+# Uso: wait_for <nombre> <url> <timeout> [--ok]
+wait_for() {
+    local name=$1 url=$2 timeout=$3 curl_flags="-s -o /dev/null"
+    if [ "$4" == "--ok" ]; then
+        curl_flags="-sf -o /dev/null"
+    fi
+    local started=$(date +%s)
+    until curl $curl_flags "$url"; do
+        # Si el servidor de la API ya terminó (por ejemplo, no pudo importar la app), no tiene sentido esperar
+        if [ -n "$API_PID" ] && ! kill -0 "$API_PID" 2>/dev/null; then
+            echo "$name terminó antes de estar listo."
+            return 1
+        fi
+        if [ $(( $(date +%s) - started )) -ge "$timeout" ]; then
+            echo "$name no respondió en ${timeout}s ($url)."
+            return 1
+        fi
+        sleep 0.5
+    done
+    echo "$name listo en $(( $(date +%s) - started ))s."
+}
+
 # Inicia MageAI en segundo plano
 echo "Iniciando MageAI en el puerto 6789..."
 mage start heart_failure_project > mageai_logs.log 2>&1 &
 
-# Espera unos segundos para asegurarse de que MageAI está listo
-sleep 10
+# Espera a que MageAI acepte conexiones (la API no depende de MageAI: si tarda, se continúa igual)
+wait_for "MageAI" "http://localhost:6789/" "${MAGE_START_TIMEOUT_S:-60}"
 
-# Inicia el servidor FastAPI en el puerto 8000
+# Inicia el servidor FastAPI en el puerto 8000; el modelo se carga en segundo plano
 echo "Iniciando FastAPI en el puerto 8000..."
-uvicorn asgi:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+uvicorn asgi:app --host 0.0.0.0 --port 8000 &
+API_PID=$!
+
+# Espera a que /health/ready confirme que el modelo está cargado y calentado
+if ! wait_for "FastAPI" "http://localhost:8000/health/ready" "${API_START_TIMEOUT_S:-120}" --ok; then
+    curl -s "http://localhost:8000/health/ready"
+    echo
+    kill "$API_PID" 2>/dev/null
+    exit 1
+fi
+
+wait "$API_PID"
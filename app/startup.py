@@ -0,0 +1,81 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class StartupTracker:
+    """
+    Estado del arranque de la API: duración de cada fase (importaciones, carga del modelo,
+    componentes, calentamiento), si ya está lista para recibir predicciones y el error si falló.
+
+    Al terminar (bien o mal) deja una línea JSON en `log_file` con las duraciones, para seguir
+    las regresiones del arranque en frío entre despliegues.
+    """
+
+    def __init__(self, started_at: float = None, log_file: str = None):
+        self.started_at = started_at or time.perf_counter()
+        self.log_file = log_file
+        self.phases = {}
+        self.ready = False
+        self.error = None
+        self.ready_after_s = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+            print(f"Arranque: fase '{name}' en {self.phases[name]:.3f}s.")
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        print(f"Arranque: fase '{name}' en {seconds:.3f}s.")
+
+    def mark_ready(self, **details):
+        self.ready_after_s = time.perf_counter() - self.started_at
+        self.ready = True
+        print(f"API lista en {self.ready_after_s:.3f}s desde que se importó el módulo.")
+        self._write_log(details)
+
+    def fail(self, error: Exception):
+        self.error = str(error)
+        print(f"Error al iniciar la API: {self.error}")
+        self._write_log({})
+
+    def _write_log(self, details: dict):
+        if not self.log_file:
+            return
+        entry = {"timestamp": datetime.now().isoformat(), "pid": os.getpid(), **self.info(), **details}
+        try:
+            os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+            with open(self.log_file, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"No se pudo escribir el log de arranque en {self.log_file}: {e}")
+
+    def info(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "ready_after_s": self.ready_after_s,
+            "phases_s": dict(self.phases),
+        }
+
+    def stats(self) -> dict:
+        stats = {"ready": int(self.ready)}
+        if self.ready_after_s is not None:
+            stats["ready_after_seconds"] = self.ready_after_s
+        for name, seconds in self.phases.items():
+            stats[f"phase_{name}_seconds"] = seconds
+        return stats
+
+
+def tracker_from_env(started_at: float) -> StartupTracker:
+    return StartupTracker(
+        started_at=started_at,
+        log_file=os.getenv("STARTUP_LOG_FILE", os.path.join("logs", "api", "startup.log")),
+    )
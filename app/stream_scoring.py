@@ -0,0 +1,195 @@
+import asyncio
+import json
+import math
+import os
+import tempfile
+from collections import deque
+
+import numpy as np
+from starlette.responses import StreamingResponse
+
+# orjson es opcional: si no está instalado se usa el módulo json estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def dumps_line(record) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def iter_lines(byte_chunks, max_line_bytes: int):
+    """
+    Separa el cuerpo de la solicitud en líneas sin leerlo completo en memoria.
+
+    Produce `(número de línea, bytes)` por cada línea no vacía; si una línea supera `max_line_bytes`
+    se produce `(número de línea, None)` y el resto de esa línea se descarta.
+    """
+    buffer = b""
+    line_no = 0
+    skipping = False
+    async for chunk in byte_chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = buffer[start:end]
+            start = end + 1
+            if skipping:
+                # Fin de la línea demasiado larga que ya se reportó
+                skipping = False
+                continue
+            line_no += 1
+            if line.strip():
+                yield line_no, line if len(line) <= max_line_bytes else None
+        buffer = buffer[start:]
+
+        if skipping:
+            buffer = b""
+        elif len(buffer) > max_line_bytes:
+            # La línea en curso ya es demasiado larga: reportarla y descartar hasta el siguiente salto
+            line_no += 1
+            skipping = True
+            buffer = b""
+            yield line_no, None
+
+    if buffer.strip() and not skipping:
+        yield line_no + 1, buffer
+
+
+def parse_record(line: bytes, features) -> tuple:
+    """
+    Convierte una línea NDJSON en `(registro, vector de características)`.
+
+    Lanza ValueError con un mensaje para el cliente si la línea no es un registro válido.
+    """
+    try:
+        record = loads(line)
+    except ValueError:
+        raise ValueError("La línea no es un JSON válido.")
+    if not isinstance(record, dict):
+        raise ValueError("Cada línea debe ser un objeto JSON con las columnas del modelo.")
+
+    missing = [feature for feature in features if feature not in record]
+    if missing:
+        raise ValueError(f"Faltan las columnas necesarias para el modelo: {set(missing)}")
+
+    x = np.empty(len(features), dtype=np.float64)
+    for j, feature in enumerate(features):
+        value = record[feature]
+        if type(value) not in (int, float) or not math.isfinite(value) or abs(value) > np.finfo(np.float32).max:
+            raise ValueError(f"La columna {feature} debe ser un número finito.")
+        x[j] = value
+    return record, x
+
+
+class ResultSpool:
+    """
+    Cola de bytes entre el lector de la solicitud y la respuesta.
+
+    Muchos clientes (requests, httpx) envían todo el cuerpo antes de leer la respuesta; si la
+    respuesta esperara al cliente, el servidor dejaría de leer la entrada y ambos se bloquearían.
+    Por eso la lectura y la puntuación nunca esperan a la respuesta: los resultados se guardan en
+    memoria hasta `max_memory_bytes` y, a partir de ahí, en un archivo temporal que se vacía en orden.
+    """
+
+    def __init__(self, max_memory_bytes: int = 8 * 1024 * 1024, read_size: int = 256 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.read_size = read_size
+        self._chunks = deque()
+        self._memory_bytes = 0
+        self._file = None
+        self._read_pos = 0
+        self._write_pos = 0
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.spilled_bytes = 0
+
+    def write(self, data: bytes):
+        # Mientras el archivo tenga datos pendientes, todo va al archivo para conservar el orden
+        if self._file is None and self._memory_bytes + len(data) <= self.max_memory_bytes:
+            self._chunks.append(data)
+            self._memory_bytes += len(data)
+        else:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile()
+                self._read_pos = self._write_pos = 0
+            self._file.seek(self._write_pos)
+            self._file.write(data)
+            self._write_pos += len(data)
+            self.spilled_bytes += len(data)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def read(self) -> bytes:
+        """
+        Devuelve el siguiente bloque de resultados, o b"" cuando ya no habrá más.
+        """
+        while True:
+            if self._chunks:
+                data = self._chunks.popleft()
+                self._memory_bytes -= len(data)
+                return data
+            if self._file is not None:
+                self._file.seek(self._read_pos)
+                data = self._file.read(min(self.read_size, self._write_pos - self._read_pos))
+                self._read_pos += len(data)
+                if self._read_pos >= self._write_pos:
+                    # Archivo vaciado: las siguientes escrituras vuelven a la memoria
+                    self._file.close()
+                    self._file = None
+                return data
+            if self.closed:
+                return b""
+            self._ready.clear()
+            await self._ready.wait()
+
+    def discard(self):
+        self._chunks.clear()
+        self._memory_bytes = 0
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Respuesta en streaming que puede seguir leyendo el cuerpo de la solicitud mientras responde.
+
+    StreamingResponse vigila la desconexión del cliente consumiendo `receive()` en paralelo, lo que
+    descartaría el cuerpo que todavía no se ha leído. Aquí el propio generador lee el cuerpo (y
+    detecta la desconexión con ClientDisconnect), así que basta con enviar la respuesta.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def stream_settings_from_env() -> dict:
+    """
+    Tamaño de bloque (PREDICT_STREAM_CHUNK_SIZE), tamaño máximo de línea (PREDICT_STREAM_MAX_LINE_BYTES)
+    y memoria máxima para resultados todavía no enviados (PREDICT_STREAM_SPOOL_MEMORY_BYTES).
+    """
+    return {
+        "chunk_size": int(os.getenv("PREDICT_STREAM_CHUNK_SIZE", "500")),
+        "max_line_bytes": int(os.getenv("PREDICT_STREAM_MAX_LINE_BYTES", "65536")),
+        "spool_memory_bytes": int(os.getenv("PREDICT_STREAM_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024))),
+    }
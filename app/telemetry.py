@@ -0,0 +1,165 @@
+import time
+from bisect import bisect_left
+
+# Límites de los histogramas de latencia (segundos) y de filas por solicitud
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ROWS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+# Etapas de /predict que se miden por separado
+STAGES = ("parse", "validate", "predict", "log_write", "serialize")
+
+
+class Histogram:
+    """
+    Histograma de límites fijos: observar cuesta una búsqueda binaria y dos sumas.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def prometheus_lines(self, name: str, labels: str = "") -> list:
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = "{" + labels + "}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class Telemetry:
+    """
+    Telemetría de la API en memoria: solicitudes y errores por ruta, latencia total y por etapa
+    de /predict, filas por solicitud y versión del modelo. Se expone en formato de texto de Prometheus.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.request_latency = {}
+        self.stage_latency = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.rows = Histogram(ROWS_BUCKETS)
+        self.predictions = 0
+        self.started_at = time.time()
+        # Fuentes adicionales de métricas: funciones que devuelven {nombre: valor}
+        self.gauges = {}
+
+    def observe_request(self, path: str, status: int, seconds: float):
+        key = (path, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.request_latency.get(path)
+        if histogram is None:
+            histogram = self.request_latency[path] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stage_latency[stage].observe(seconds)
+
+    def observe_rows(self, n_rows: int):
+        self.rows.observe(n_rows)
+        self.predictions += n_rows
+
+    def register_gauges(self, prefix: str, source):
+        """
+        Agrega las métricas numéricas que devuelve `source()` (por ejemplo los contadores de la caché).
+        """
+        self.gauges[prefix] = source
+
+    def render(self, model_version: str) -> str:
+        lines = [
+            "# HELP api_requests_total Solicitudes atendidas por ruta y código de estado.",
+            "# TYPE api_requests_total counter",
+        ]
+        for (path, status), count in sorted(self.requests.items()):
+            lines.append(f'api_requests_total{{path="{path}",status="{status}"}} {count}')
+
+        lines.append("# HELP api_request_errors_total Solicitudes con código de estado >= 400 por ruta.")
+        lines.append("# TYPE api_request_errors_total counter")
+        errors = {}
+        for (path, status), count in self.requests.items():
+            if status >= 400:
+                errors[path] = errors.get(path, 0) + count
+        for path, count in sorted(errors.items()):
+            lines.append(f'api_request_errors_total{{path="{path}"}} {count}')
+
+        lines.append("# HELP api_request_latency_seconds Latencia total de la solicitud por ruta.")
+        lines.append("# TYPE api_request_latency_seconds histogram")
+        for path, histogram in sorted(self.request_latency.items()):
+            lines.extend(histogram.prometheus_lines("api_request_latency_seconds", f'path="{path}"'))
+
+        lines.append("# HELP api_predict_stage_latency_seconds Latencia de cada etapa de /predict.")
+        lines.append("# TYPE api_predict_stage_latency_seconds histogram")
+        for stage in STAGES:
+            lines.extend(self.stage_latency[stage].prometheus_lines("api_predict_stage_latency_seconds", f'stage="{stage}"'))
+
+        lines.append("# HELP api_predict_rows Filas por solicitud a /predict.")
+        lines.append("# TYPE api_predict_rows histogram")
+        lines.extend(self.rows.prometheus_lines("api_predict_rows"))
+
+        lines.append("# HELP api_predictions_total Filas evaluadas por el modelo.")
+        lines.append("# TYPE api_predictions_total counter")
+        lines.append(f"api_predictions_total {self.predictions}")
+
+        lines.append("# HELP api_model_info Versión del modelo activo.")
+        lines.append("# TYPE api_model_info gauge")
+        lines.append(f'api_model_info{{version="{model_version}"}} 1')
+
+        lines.append("# HELP api_uptime_seconds Segundos desde que inició la API.")
+        lines.append("# TYPE api_uptime_seconds gauge")
+        lines.append(f"api_uptime_seconds {time.time() - self.started_at}")
+
+        for prefix, source in self.gauges.items():
+            for name, value in source().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{name} gauge")
+                    lines.append(f"{prefix}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class TelemetryMiddleware:
+    """
+    Middleware ASGI mínimo: guarda el instante de llegada en `scope["state"]` (para medir la etapa
+    `parse` dentro del handler) y registra código de estado y latencia total de cada solicitud.
+    """
+
+    def __init__(self, app, telemetry: Telemetry):
+        self.app = app
+        self.telemetry = telemetry
+        self.paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.paths is None:
+            # Solo se etiquetan rutas conocidas, para no crear series nuevas por cada URL desconocida
+            self.paths = {route.path for route in scope["app"].routes}
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["started_at"] = started
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = scope["path"] if scope["path"] in self.paths else "other"
+            self.telemetry.observe_request(path, status, time.perf_counter() - started)